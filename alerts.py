@@ -0,0 +1,197 @@
+"""
+ALERT DISPATCH
+Change alerts queue in the store's outbox and a background worker sends
+them as per-recipient email digests over one reused SMTP connection
+"""
+
+import os
+import random
+import smtplib
+import socket
+import threading
+import time
+import logging
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+logger = logging.getLogger(__name__)
+
+# Seconds between digests to one recipient
+DIGEST_INTERVALS = {'immediate': 0, 'hourly': 3600, 'daily': 86400}
+
+
+def digest_text(changes, max_items=200):
+    """Plain-text body listing changes, newest last, capped at max_items."""
+    lines = []
+    for change in changes[:max_items]:
+        lines.append(f"{change.get('property_address', change.get('property_id'))} ({change['detected_date'][:10]})")
+        for field in change['changes']:
+            lines.append(f"    {field['field']}: {field.get('old_value')} -> {field.get('new_value')}")
+    if len(changes) > max_items:
+        lines.append(f"\n...and {len(changes) - max_items} more changes; see the dashboard for all of them.")
+    return '\n'.join(lines) + '\n'
+
+
+class AlertDispatcher:
+    """Drains the outbox into digest emails, under a store lease so only one process sends.
+    
+    Config is the alerts.email section: smtp_host, smtp_port, ssl,
+    starttls, username, password, from, to (default recipients), digest
+    ('immediate', 'hourly' or 'daily'), max_items, poll_seconds,
+    backoff_max and max_failures (refusals before a digest is dropped).
+    """
+    
+    def __init__(self, store, config=None):
+        self.store = store
+        self.config = config or {}
+        self.enabled = bool(self.config.get('enabled'))
+        self.interval = DIGEST_INTERVALS[self.config.get('digest', 'immediate')]
+        self.poll_seconds = self.config.get('poll_seconds', 30)
+        self.backoff_max = self.config.get('backoff_max', 3600)
+        self.max_failures = self.config.get('max_failures', 8)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:alerts"
+        self.smtp = None
+        self.failures = 0
+        self.retry_at = 0
+        self.wakeup = threading.Event()
+        self.thread = None
+    
+    def default_recipients(self):
+        recipients = self.config.get('to') or []
+        return [recipients] if isinstance(recipients, str) else list(recipients)
+    
+    def recipients(self, changes, recipients_by_property=None):
+        """Alert addresses for each change: its property's recipient, or the defaults.
+        
+        Passed to PropertyStore.append_changes() so the outbox rows commit
+        with the changes; None while alerts are disabled.
+        """
+        if not self.enabled:
+            return None
+        recipients_by_property = recipients_by_property or {}
+        defaults = self.default_recipients()
+        return [
+            [recipients_by_property[change.get('property_id')]]
+            if recipients_by_property.get(change.get('property_id')) else defaults
+            for change in changes
+        ]
+    
+    def notify(self):
+        """Wake the dispatcher after alerts were queued."""
+        self.wakeup.set()
+    
+    def backoff(self, failures):
+        """Jittered exponential delay after `failures` consecutive failures."""
+        return random.uniform(0.5, 1) * min(self.backoff_max, 30 * 2 ** (failures - 1))
+    
+    def due(self, recipient, now):
+        if recipient['retry_at'] and recipient['retry_at'] > now:
+            return False
+        return not recipient['last_sent'] or now - recipient['last_sent'] >= self.interval
+    
+    def connection(self):
+        """The SMTP connection for this drain, opened on first use."""
+        if self.smtp is not None:
+            return self.smtp
+        host = self.config.get('smtp_host', 'localhost')
+        port = self.config.get('smtp_port', 465 if self.config.get('ssl') else 25)
+        smtp_class = smtplib.SMTP_SSL if self.config.get('ssl') else smtplib.SMTP
+        smtp = smtp_class(host, port, timeout=30)
+        try:
+            if self.config.get('starttls'):
+                smtp.starttls()
+            if self.config.get('username'):
+                smtp.login(self.config['username'], self.config.get('password', ''))
+        except Exception:
+            smtp.close()
+            raise
+        self.smtp = smtp
+        return smtp
+    
+    def close(self):
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self.smtp.close()
+        self.smtp = None
+    
+    def send_digest(self, smtp, recipient, changes):
+        count = len(changes)
+        message = MIMEMultipart()
+        message['Subject'] = f"Property Monitor: {count} change{'s' if count != 1 else ''} detected"
+        message['From'] = self.config.get('from', 'property-monitor@localhost')
+        message['To'] = recipient
+        message.attach(MIMEText(digest_text(changes, self.config.get('max_items', 200)), 'plain'))
+        smtp.sendmail(message['From'], [recipient], message.as_string())
+    
+    def drain(self):
+        """Send every due digest over one connection; returns the number of emails sent."""
+        if not self.enabled or time.time() < self.retry_at:
+            return 0
+        if not self.store.acquire_lease('alerts', self.owner, 300):
+            return 0
+        sent = 0
+        try:
+            now = time.time()
+            for recipient in self.store.pending_recipients():
+                if not self.due(recipient, now):
+                    continue
+                address = recipient['recipient']
+                outbox_ids, changes = self.store.pending_alerts(address)
+                try:
+                    if changes:
+                        self.send_digest(self.connection(), address, changes)
+                        sent += 1
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused) as e:
+                    if not isinstance(e, smtplib.SMTPRecipientsRefused) and e.smtp_code < 500:
+                        # 4xx: the server is struggling, not this message
+                        self.pause(e)
+                        break
+                    # Permanent for this digest; the connection is still usable
+                    failures = recipient['failures'] + 1
+                    if failures >= self.max_failures:
+                        self.store.drop_alerts(address, outbox_ids)
+                        logger.error(f"Alerts to {address} refused {failures} times ({e}); dropped {len(outbox_ids)} queued")
+                        continue
+                    retry_at = time.time() + self.backoff(failures)
+                    self.store.mark_alert_failed(address, retry_at)
+                    logger.warning(f"Alerts to {address} refused ({e}); retrying at {time.ctime(retry_at)}")
+                    continue
+                except (smtplib.SMTPException, OSError) as e:
+                    # Server unreachable or dropped us
+                    self.pause(e)
+                    break
+                self.store.mark_alerts_sent(address, outbox_ids)
+                self.failures = 0
+                logger.info(f"Sent alert digest of {len(changes)} changes to {address}")
+        finally:
+            self.close()
+            self.store.release_lease('alerts', self.owner)
+        return sent
+    
+    def pause(self, error):
+        """Stop all sending for a backoff period after a server-wide failure."""
+        self.close()
+        self.failures += 1
+        delay = self.backoff(self.failures)
+        self.retry_at = time.time() + delay
+        logger.error(f"Alert email failed ({error}); retrying in {delay:.0f}s")
+    
+    def run(self, stop):
+        while not stop.is_set():
+            try:
+                self.drain()
+            except Exception as e:
+                logger.error(f"Alert dispatch failed: {e}")
+            self.wakeup.wait(self.poll_seconds)
+            self.wakeup.clear()
+    
+    def start(self):
+        """Run the dispatcher on a daemon thread; returns the Event that stops it."""
+        stop = threading.Event()
+        if self.enabled and self.thread is None:
+            self.thread = threading.Thread(target=self.run, args=(stop,), name='alerts', daemon=True)
+            self.thread.start()
+        return stop
@@ -1,15 +1,28 @@
-from flask import Flask, render_template_string, jsonify, request
+from flask import Flask, render_template_string, jsonify, request, Response, stream_with_context
 import json
 import os
-from datetime import datetime
+import hashlib
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from monitor_service import PropertyMonitor
+from monitor_service import PropertyMonitor, read_watchlist
+from job_runner import JobRunner
+from scheduler import ShardScheduler
+import metrics
 
 app = Flask(__name__)
 
 # Ensure data directory exists
 Path('data').mkdir(exist_ok=True)
 
+# One long-lived monitor; handlers serve from its in-memory state
+monitor = PropertyMonitor()
+jobs = JobRunner()
+# Sends queued change alerts in the background when alerts.email is enabled
+monitor.alerts.start()
+
+JOBS = metrics.gauge('jobs', 'Background jobs by status', ('status',))
+
 MOBILE_HTML = """
 <!DOCTYPE html>
 <html lang="en">
@@ -266,14 +279,32 @@ MOBILE_HTML = """
     </div>
     
     <script>
+        let latestChangeId = 0;
+        let jobWaiters = {};
+        
+        function renderChange(change) {
+            const date = new Date(change.detected_date).toLocaleDateString();
+            const changesText = change.changes.map(c => 
+                `<div class="change-detail"><strong>${c.field}:</strong> ${c.old_value} → ${c.new_value}</div>`
+            ).join('');
+            
+            return `
+                <div class="change-item">
+                    <div class="change-date">${date}</div>
+                    <div class="change-address">${change.property_address}</div>
+                    ${changesText}
+                </div>
+            `;
+        }
+        
         async function loadData() {
             try {
-                const resp = await fetch('/api/data');
+                const resp = await fetch('/api/data?changes_limit=10&properties_limit=15');
                 const data = await resp.json();
                 
                 // Update stats
-                document.getElementById('totalTracked').textContent = data.properties.length;
-                document.getElementById('totalChanges').textContent = data.changes.length;
+                document.getElementById('totalTracked').textContent = data.properties_total;
+                document.getElementById('totalChanges').textContent = data.changes_total;
                 
                 // Render changes
                 const changesList = document.getElementById('changesList');
@@ -281,20 +312,8 @@ MOBILE_HTML = """
                     changesList.innerHTML = '<div class="no-data">No changes detected yet.<br><small>Run a check to start monitoring!</small></div>';
                 } else {
                     const recentChanges = data.changes.slice(-10).reverse();
-                    changesList.innerHTML = recentChanges.map(change => {
-                        const date = new Date(change.detected_date).toLocaleDateString();
-                        const changesText = change.changes.map(c => 
-                            `<div class="change-detail"><strong>${c.field}:</strong> ${c.old_value} → ${c.new_value}</div>`
-                        ).join('');
-                        
-                        return `
-                            <div class="change-item">
-                                <div class="change-date">${date}</div>
-                                <div class="change-address">${change.property_address}</div>
-                                ${changesText}
-                            </div>
-                        `;
-                    }).join('');
+                    changesList.innerHTML = recentChanges.map(renderChange).join('');
+                    latestChangeId = Math.max(latestChangeId, ...data.changes.map(c => c.id || 0));
                 }
                 
                 // Render properties
@@ -308,7 +327,7 @@ MOBILE_HTML = """
                         
                         if (prop.search_type === 'zip') {
                             return `
-                                <div class="property-item">
+                                <div class="property-item" onclick="toggleHistory(this, '${prop.id}')">
                                     <div class="property-label">ZIP Code ${prop.search_value}</div>
                                     <div class="property-detail">Monitoring entire area • Added ${added}</div>
                                 </div>
@@ -316,7 +335,7 @@ MOBILE_HTML = """
                         } else {
                             const data = prop.current_data || {};
                             return `
-                                <div class="property-item">
+                                <div class="property-item" onclick="toggleHistory(this, '${prop.id}')">
                                     <div class="property-label">${data.PHYSICAL_ADDRESS || prop.search_value}</div>
                                     <div class="property-detail">
                                         ${data.OWNER ? 'Owner: ' + data.OWNER : ''} • Added ${added}
@@ -326,8 +345,8 @@ MOBILE_HTML = """
                         }
                     }).join('');
                     
-                    if (data.properties.length > 15) {
-                        propsList.innerHTML += `<div class="property-detail" style="text-align:center;margin-top:10px;color:#999;">And ${data.properties.length - 15} more...</div>`;
+                    if (data.properties_total > 15) {
+                        propsList.innerHTML += `<div class="property-detail" style="text-align:center;margin-top:10px;color:#999;">And ${data.properties_total - 15} more...</div>`;
                     }
                 }
                 
@@ -337,8 +356,90 @@ MOBILE_HTML = """
             }
         }
         
+        async function toggleHistory(item, propertyId) {
+            // Tap a tracked property to show its latest changes
+            const open = item.querySelector('.history');
+            if (open) {
+                open.remove();
+                return;
+            }
+            const history = await (await fetch(`/api/properties/${encodeURIComponent(propertyId)}/history?limit=5`)).json();
+            const lines = history.changes.flatMap(change => change.changes.map(c =>
+                `<div class="change-detail">${new Date(change.detected_date).toLocaleDateString()} <strong>${c.field}:</strong> ${c.old_value} → ${c.new_value}</div>`
+            ));
+            item.insertAdjacentHTML('beforeend',
+                `<div class="history">${lines.join('') || '<div class="property-detail">No changes yet</div>'}</div>`);
+        }
+        
+        function addChange(change) {
+            // Pushed by the stream: prepend it and keep the list at 10
+            const changesList = document.getElementById('changesList');
+            if (!changesList.querySelector('.change-item')) {
+                changesList.innerHTML = '';
+            }
+            changesList.insertAdjacentHTML('afterbegin', renderChange(change));
+            while (changesList.children.length > 10) {
+                changesList.lastElementChild.remove();
+            }
+            latestChangeId = Math.max(latestChangeId, change.id);
+        }
+        
+        function connectStream() {
+            // Resumes after the last change shown; EventSource sends Last-Event-ID on reconnect
+            const source = new EventSource(`/api/stream?after=${latestChangeId}`);
+            
+            source.addEventListener('change', e => addChange(JSON.parse(e.data)));
+            
+            source.addEventListener('stats', e => {
+                const stats = JSON.parse(e.data);
+                const tracked = document.getElementById('totalTracked');
+                const propertiesChanged = tracked.textContent !== String(stats.properties_total);
+                tracked.textContent = stats.properties_total;
+                document.getElementById('totalChanges').textContent = stats.changes_total;
+                if (propertiesChanged) {
+                    loadData();
+                }
+            });
+            
+            source.addEventListener('job', e => {
+                const job = JSON.parse(e.data);
+                const waiter = jobWaiters[job.id];
+                if (waiter) {
+                    waiter(job);
+                }
+            });
+        }
+        
+        function waitForJob(jobId, onProgress) {
+            return new Promise(resolve => {
+                jobWaiters[jobId] = job => {
+                    if (job.status === 'done' || job.status === 'failed') {
+                        delete jobWaiters[jobId];
+                        resolve(job);
+                    } else {
+                        onProgress(job);
+                    }
+                };
+                // In case it finished before the stream delivered anything
+                fetch(`/api/check/${jobId}`).then(r => r.json()).then(job => {
+                    if (jobWaiters[jobId]) {
+                        jobWaiters[jobId](job);
+                    }
+                });
+            });
+        }
+        
+        async function pollJob(job, onProgress) {
+            while (job.status === 'queued' || job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, 2000));
+                job = await (await fetch(`/api/check/${job.job_id || job.id}`)).json();
+                onProgress(job);
+            }
+            return job;
+        }
+        
         async function checkNow() {
-            if (!confirm('Run a property check now? This may take 1-2 minutes to check all tracked properties.')) {
+            if (!confirm('Run a property check now? It runs in the background; progress shows on the button.')) {
                 return;
             }
             
@@ -346,13 +447,27 @@ MOBILE_HTML = """
             btn.disabled = true;
             btn.innerHTML = '<div class="spinner" style="width:20px;height:20px;border-width:2px;display:inline-block;margin-right:10px;"></div> Checking...';
             
+            const showProgress = job => {
+                if (job.total) {
+                    btn.lastChild.textContent = ` Checking... ${job.done}/${job.total}`;
+                }
+            };
+            
             try {
                 const response = await fetch('/api/check', { method: 'POST' });
-                const result = await response.json();
+                let job = await response.json();
+                
+                if (job.status === 'queued' || job.status === 'running') {
+                    job = window.EventSource
+                        ? await waitForJob(job.job_id, showProgress)
+                        : await pollJob(job, showProgress);
+                }
                 
-                if (result.success) {
-                    await loadData();
-                    alert(`✅ Check complete!\n\nFound ${result.changes} change(s).`);
+                if (job.status === 'done') {
+                    if (!window.EventSource) {
+                        await loadData();
+                    }
+                    alert(`✅ Check complete!\n\nFound ${job.changes} change(s).`);
                 } else {
                     alert('❌ Check failed. Please try again.');
                 }
@@ -365,11 +480,14 @@ MOBILE_HTML = """
             }
         }
         
-        // Load data on startup
-        loadData();
-        
-        // Auto-refresh every 60 seconds
-        setInterval(loadData, 60000);
+        // Load data on startup, then follow the push feed
+        loadData().then(() => {
+            if (window.EventSource) {
+                connectStream();
+            } else {
+                setInterval(loadData, 60000);
+            }
+        });
     </script>
 </body>
 </html>
@@ -379,44 +497,221 @@ MOBILE_HTML = """
 def index():
     return render_template_string(MOBILE_HTML)
 
+def int_arg(name, default=None):
+    value = request.args.get(name, type=int)
+    return default if value is None or value < 0 else value
+
 @app.route('/api/data')
 def get_data():
-    """Get tracked properties and changes"""
-    try:
-        with open('data/tracked_properties.json', 'r') as f:
-            properties = json.load(f)
-    except FileNotFoundError:
-        properties = []
+    """Get tracked properties and changes
     
-    try:
-        with open('data/detected_changes.json', 'r') as f:
-            changes = json.load(f)
-    except FileNotFoundError:
-        changes = []
+    Query params: properties_limit/properties_offset, changes_limit/
+    changes_offset (offset counts back from the newest change), since
+    (ISO date), zip, owner and field filters. Responses carry an ETag and
+    Last-Modified so an unchanged poll is answered 304 from memory.
+    """
+    monitor.refresh_if_stale()
+    revision, modified = monitor.state_revision, monitor.state_modified
+    etag = hashlib.sha1(f"{revision}?{request.query_string.decode()}".encode()).hexdigest()[:16]
+    last_modified = datetime.fromtimestamp(int(modified), timezone.utc)
     
-    return jsonify({
-        'properties': properties,
-        'changes': changes,
-        'last_updated': datetime.now().isoformat()
-    })
+    if request.if_none_match:
+        unchanged = etag in request.if_none_match
+    else:
+        unchanged = bool(request.if_modified_since and last_modified <= request.if_modified_since)
+    
+    if unchanged:
+        response = app.response_class(status=304)
+    else:
+        zip_code = request.args.get('zip')
+        properties, properties_total = monitor.query_properties(
+            zip_code=zip_code,
+            owner=request.args.get('owner'),
+            limit=int_arg('properties_limit'),
+            offset=int_arg('properties_offset', 0)
+        )
+        changes, changes_total = monitor.query_changes(
+            since=request.args.get('since'),
+            zip_code=zip_code,
+            field=request.args.get('field'),
+            limit=int_arg('changes_limit'),
+            offset=int_arg('changes_offset', 0)
+        )
+        response = jsonify({
+            'properties': properties,
+            'properties_total': properties_total,
+            'changes': changes,
+            'changes_total': changes_total,
+            'last_updated': last_modified.isoformat()
+        })
+    
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/api/properties/<path:property_id>/history')
+def property_history(property_id):
+    """Change history of one watch id (prop_/zip_) or ASSESSMENT_NUM
+    
+    Query params: field, since and until (ISO dates, since <= date <
+    until), limit/offset. Months past the retention period come back as
+    monthly rollups.
+    """
+    history = monitor.property_history(
+        property_id,
+        since=request.args.get('since'),
+        until=request.args.get('until'),
+        field=request.args.get('field'),
+        limit=int_arg('limit', 100),
+        offset=int_arg('offset', 0)
+    )
+    return jsonify({'property_id': property_id, **history})
+
+def check_job(progress):
+    # Shard leases keep this off whatever the scheduler is checking right now
+    ShardScheduler(monitor).run_all(progress)
+
+def import_job(rows, default_type):
+    def run(progress):
+        monitor.refresh_if_stale()
+        report = monitor.import_properties(rows, default_type)
+        progress(report['rows'], report['rows'], 0)
+        return report
+    return run
 
 @app.route('/api/check', methods=['POST'])
 def run_check():
-    """Run property check"""
-    try:
-        monitor = PropertyMonitor()
-        changes = monitor.check_all_properties()
-        
-        return jsonify({
-            'success': True,
-            'changes': len(changes),
-            'timestamp': datetime.now().isoformat()
-        })
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+    """Queue a property check; a check already in flight is reused"""
+    job, created = jobs.submit('check', check_job)
+    return jsonify({
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'already_running': not created
+    }), 202
+
+@app.route('/api/check/<job_id>')
+@app.route('/api/import/<job_id>')
+def check_status(job_id):
+    """Progress of a queued property check or import (its report is the job's result)"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': job['status'] != 'failed', **job})
+
+# Change records sent at once; a client further behind gets the newest ones
+STREAM_BACKLOG = 50
+# Seconds between keepalives, which double as the check for other processes' writes
+STREAM_KEEPALIVE = 15
+# Minimum seconds between progress events for one job; its final state is always sent
+STREAM_JOB_INTERVAL = 1
+
+def sse(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return '\n'.join(lines) + '\n\n'
+
+def stream_cursor():
+    """Change id to resume after: Last-Event-ID, else ?after=, else the newest change."""
+    for value in (request.headers.get('Last-Event-ID'), request.args.get('after')):
+        if value and value.isdigit():
+            return int(value)
+    monitor.refresh_if_stale()
+    return monitor.last_change_id()
+
+@app.route('/api/import', methods=['POST'])
+def import_watchlist():
+    """Bulk-add watchlist entries
+    
+    Takes a CSV upload (form field 'file') or CSV body in the format
+    read_watchlist() understands, or JSON {"rows": [...], "type": ...}
+    whose rows are values or {"value", "type"} objects. ?type= sets the
+    default search type. The import runs as a background job; poll
+    /api/import/<job_id> for the report with per-row failures.
+    """
+    default_type = request.args.get('type', 'address')
+    if 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8-sig')
+        rows = read_watchlist(text.splitlines(), default_type)
+    elif request.is_json:
+        body = request.get_json(silent=True) or {}
+        default_type = body.get('type', default_type)
+        rows = [
+            (row.get('value'), row.get('type') or default_type) if isinstance(row, dict) else row
+            for row in body.get('rows', [])
+        ]
+    else:
+        rows = read_watchlist(request.get_data(as_text=True).splitlines(), default_type)
+    
+    # Parsed here, while the request body is still available
+    job, _ = jobs.submit('import', import_job(list(rows), default_type), exclusive=False)
+    return jsonify({'success': True, 'job_id': job['id'], 'status': job['status']}), 202
+
+@app.route('/api/stream')
+def stream():
+    """Server-Sent Events: new change records, totals and check progress
+    
+    Change events carry the change id as their event id, so a reconnecting
+    EventSource resumes from Last-Event-ID. Between checks a connection
+    costs one stat() per keepalive; during one, job progress is coalesced
+    to one event per job per STREAM_JOB_INTERVAL.
+    """
+    cursor = stream_cursor()
+    
+    def events():
+        last_id, revision, version = cursor, None, jobs.version
+        # Latest unsent state and last send time per job
+        held, sent = {}, {}
+        yield "retry: 5000\n\n"
+        while True:
+            monitor.refresh_if_stale()
+            for change in monitor.changes_after(last_id, STREAM_BACKLOG):
+                last_id = change['id']
+                yield sse('change', change, last_id)
+            if monitor.state_revision != revision:
+                revision = monitor.state_revision
+                yield sse('stats', {
+                    'properties_total': len(monitor.tracked_properties),
+                    'changes_total': monitor.changes_total
+                })
+            if held:
+                # Progress ticks faster than clients need; sleep to the next send
+                due = min(sent.get(job_id, 0) for job_id in held) + STREAM_JOB_INTERVAL
+                time.sleep(max(0, due - time.monotonic()))
+            version, updated = jobs.wait(version, 0 if held else STREAM_KEEPALIVE)
+            held.update((job['id'], job) for job in updated)
+            now = time.monotonic()
+            flushed = False
+            for job_id, job in list(held.items()):
+                final = job['status'] in ('done', 'failed')
+                if not final and now - sent.get(job_id, 0) < STREAM_JOB_INTERVAL:
+                    continue
+                del held[job_id]
+                if final:
+                    sent.pop(job_id, None)
+                else:
+                    sent[job_id] = now
+                # Reports can be long; clients fetch them from the job's status URL
+                job.pop('result', None)
+                yield sse('job', job)
+                flushed = True
+            if not updated and not flushed:
+                yield ": keepalive\n\n"
+    
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.cache_control.no_cache = True
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus metrics: county API traffic, check stages, cache, job queue"""
+    monitor.collect_metrics()
+    for status, count in jobs.depth().items():
+        JOBS.set(count, status=status)
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/health')
 def health():
@@ -3,39 +3,95 @@ BATON ROUGE PROPERTY SCRAPER
 Uses official ArcGIS REST API
 """
 
-import requests
-import pandas as pd
 from datetime import datetime
 import json
+import csv
+import gzip
+import itertools
 import time
 import logging
+import os
+import re
+from pathlib import Path
+from fetch_engine import BatchFetcher, CountyAPIError
+from response_cache import ResponseCache
+from exporter import export, is_columnar
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+ZIP_CODE = re.compile(r'\d{5}')
+
+
+def quote(value):
+    """A string literal for an ArcGIS where clause, single quotes doubled."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def find_column(lines, columns):
+    """Split CSV lines into (header, index, rows) by the first of columns found.
+    
+    Header names are matched case-insensitively and returned lower-cased.
+    When none of columns is in the first line it is taken as data: header
+    is None and index 0, the first column.
+    """
+    reader = csv.reader(lines)
+    first = next(reader, [])
+    header = [h.strip().lower() for h in first]
+    for column in columns:
+        if column.lower() in header:
+            return header, header.index(column.lower()), reader
+    return None, 0, itertools.chain([first], reader)
+
+
+def read_addresses(csv_file, column='address'):
+    """Yield addresses from a CSV, by column name or else the first column."""
+    with open(csv_file, 'r', newline='') as f:
+        _, index, rows = find_column(f, [column])
+        for row in rows:
+            if len(row) > index and row[index].strip():
+                yield row[index].strip()
+
+
+def point_in_polygon(x, y, rings):
+    """Even-odd ray cast over every ring, so holes are excluded."""
+    inside = False
+    for ring in rings:
+        for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+            if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                inside = not inside
+    return inside
+
+
 class BatonRougePropertyScraper:
-    def __init__(self):
-        self.gis_base = "https://maps.brla.gov/gis/rest/services"
+    def __init__(self, fetcher=None, gis_base=None, fields=None):
+        self.gis_base = (
+            gis_base
+            or os.environ.get('PROPERTY_MONITOR_GIS_BASE')
+            or "https://maps.brla.gov/gis/rest/services"
+        )
         self.parcels_url = f"{self.gis_base}/Cadastral/Parcels/MapServer/0"
-        self.session = requests.Session()
+        # Parcel fields to request; None means all of them
+        self.out_fields = ','.join(fields) if fields else '*'
+        self.fetcher = fetcher or BatchFetcher(cache=ResponseCache())
+        self.session = self.fetcher.session
         self.properties = []
+        self.batch_geocoding = True
         logger.info("Initialized Baton Rouge Property Scraper")
     
     def get_parcel_by_address(self, address):
         """Find a parcel by address."""
         geocode_url = f"{self.gis_base}/EBR_Composite_Locator/GeocodeServer/findAddressCandidates"
         
+        # Only the candidate location is used, so no extra locator fields
         params = {
             'SingleLine': address,
-            'f': 'json',
-            'outFields': '*'
+            'f': 'json'
         }
         
         try:
-            response = requests.get(geocode_url, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            data = self.fetcher.get_json(geocode_url, params)
             
             if data.get('candidates'):
                 best_match = data['candidates'][0]
@@ -55,15 +111,13 @@ class BatonRougePropertyScraper:
             'geometry': f"{x},{y}",
             'geometryType': 'esriGeometryPoint',
             'spatialRel': 'esriSpatialRelIntersects',
-            'outFields': '*',
+            'outFields': self.out_fields,
             'returnGeometry': 'false',
             'f': 'json'
         }
         
         try:
-            response = requests.get(query_url, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
+            data = self.fetcher.get_json(query_url, params)
             
             if data.get('features'):
                 return data['features'][0]['attributes']
@@ -72,54 +126,260 @@ class BatonRougePropertyScraper:
             logger.error(f"Error querying parcel: {e}")
             return None
     
-    def search_parcels_by_zip(self, zip_code):
-        """Get all parcels in a ZIP code."""
-        query_url = f"{self.parcels_url}/query"
+    def get_parcels_by_addresses(self, addresses, batch_size=500, points_per_query=100):
+        """Resolve many addresses to parcels with batched requests.
+        
+        addresses is any iterable (or a CSV path, see read_addresses).
+        Each batch is geocoded with one geocodeAddresses call, falling back
+        to concurrent findAddressCandidates calls if the locator refuses
+        batches, and the points are matched to parcels with multipoint
+        spatial queries. Batches run concurrently on the fetcher's pool.
+        Yields (address, attributes or None) in input order.
+        """
+        if isinstance(addresses, (str, Path)):
+            addresses = read_addresses(addresses)
+        
+        def batches():
+            batch = []
+            for address in addresses:
+                batch.append(address)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        
+        def resolve(batch):
+            return self._resolve_batch(batch, points_per_query)
+        
+        for batch, parcels, error in self.fetcher.map(resolve, batches()):
+            if error:
+                logger.error(f"Error resolving batch of {len(batch)} addresses: {error}")
+                parcels = [None] * len(batch)
+            yield from zip(batch, parcels)
+    
+    def _resolve_batch(self, batch, points_per_query):
+        locations, spatial_reference = self.geocode_addresses(batch)
+        parcels = [None] * len(batch)
+        located = [(i, loc) for i, loc in enumerate(locations) if loc]
+        
+        for start in range(0, len(located), points_per_query):
+            group = located[start:start + points_per_query]
+            features = self._query_parcels_at_points([loc for _, loc in group], spatial_reference)
+            for i, loc in group:
+                for feature in features:
+                    rings = feature.get('geometry', {}).get('rings', [])
+                    if point_in_polygon(loc['x'], loc['y'], rings):
+                        parcels[i] = feature['attributes']
+                        break
+        
+        logger.info(f"Resolved {sum(p is not None for p in parcels)}/{len(batch)} addresses")
+        return parcels
+    
+    def geocode_addresses(self, batch):
+        """Locations (or None) for a batch of addresses, plus their spatial reference."""
+        locator = f"{self.gis_base}/EBR_Composite_Locator/GeocodeServer"
+        if self.batch_geocoding:
+            records = [
+                {'attributes': {'OBJECTID': i, 'SingleLine': address}}
+                for i, address in enumerate(batch)
+            ]
+            try:
+                data = self.fetcher.get_json(f"{locator}/geocodeAddresses", data={
+                    'addresses': json.dumps({'records': records}),
+                    'f': 'json'
+                })
+                locations = [None] * len(batch)
+                for result in data.get('locations', []):
+                    attributes = result.get('attributes', {})
+                    index = attributes.get('ResultID')
+                    if result.get('location') and index is not None and 0 <= index < len(batch):
+                        locations[index] = result['location']
+                return locations, data.get('spatialReference')
+            except CountyAPIError as e:
+                logger.warning(f"Batch geocoding unavailable ({e}); using single-address lookups")
+                self.batch_geocoding = False
+        
+        def find(address):
+            data = self.fetcher.get_json(f"{locator}/findAddressCandidates", {
+                'SingleLine': address,
+                'f': 'json'
+            })
+            candidates = data.get('candidates')
+            return (candidates[0].get('location'), data.get('spatialReference')) if candidates else (None, None)
         
+        results = [result if not error else (None, None) for _, result, error in self.fetcher.map(find, batch)]
+        spatial_reference = next((sr for _, sr in results if sr), None)
+        return [location for location, _ in results], spatial_reference
+    
+    def _query_parcels_at_points(self, points, spatial_reference=None):
+        geometry = {'points': [[p['x'], p['y']] for p in points]}
         params = {
-            'where': f"ZIP = '{zip_code}'",
-            'outFields': '*',
-            'returnGeometry': 'false',
-            'f': 'json',
-            'resultRecordCount': 1000
+            'geometryType': 'esriGeometryMultipoint',
+            'spatialRel': 'esriSpatialRelIntersects',
+            'outFields': self.out_fields,
+            # Geometry is needed to tell which parcel each point fell in
+            'returnGeometry': 'true',
+            'f': 'json'
         }
+        if spatial_reference:
+            geometry['spatialReference'] = spatial_reference
+            # Rings come back in the points' reference, so the containment test compares like with like
+            params['outSR'] = json.dumps(spatial_reference)
+        params['geometry'] = json.dumps(geometry)
+        data = self.fetcher.get_json(f"{self.parcels_url}/query", data=params)
+        return data.get('features', [])
+    
+    def iter_parcel_pages(self, zip_code, page_size=1000, offset=0):
+        """Yield (offset after the page, parcels) for each page of a ZIP code.
+        
+        Pages are walked with resultOffset, starting at offset, until the
+        server stops reporting exceededTransferLimit.
+        """
+        query_url = f"{self.parcels_url}/query"
+        while True:
+            params = {
+                'where': f"ZIP = {quote(zip_code)}",
+                'outFields': self.out_fields,
+                'returnGeometry': 'false',
+                'orderByFields': 'OBJECTID',
+                'resultOffset': offset,
+                'resultRecordCount': page_size,
+                'f': 'json'
+            }
+            
+            data = self.fetcher.get_json(query_url, params)
+            features = data.get('features', [])
+            offset += len(features)
+            if features:
+                yield offset, [feature['attributes'] for feature in features]
+            more = data.get('exceededTransferLimit', len(features) == page_size)
+            if not features or not more:
+                break
+    
+    def iter_parcels_by_zip(self, zip_code, page_size=1000):
+        """Yield every parcel in a ZIP code, one page at a time."""
+        offset = 0
+        for offset, parcels in self.iter_parcel_pages(zip_code, page_size):
+            yield from parcels
+        logger.info(f"Harvested {offset} parcels in ZIP {zip_code}")
+    
+    def harvest_zip(self, zip_code, filename, page_size=1000, checkpoint_file=None):
+        """Harvest a ZIP code to CSV (gzipped for .gz), resumably; returns the row count.
         
+        Each page is appended and flushed to disk before checkpoint_file
+        records it, together with the output's name, size and columns. A
+        resumed harvest trims anything written after the last checkpoint
+        and appends to the same file; the checkpoint is removed once the
+        ZIP is done.
+        """
+        if is_columnar(filename):
+            raise ValueError("Resumable harvests write CSV; export_to_csv() handles Parquet/Arrow")
+        opener = gzip.open if str(filename).endswith('.gz') else open
+        checkpoint = self._load_checkpoint(checkpoint_file, zip_code, filename)
+        offset = checkpoint.get('offset', 0)
+        columns = checkpoint.get('columns')
+        if offset:
+            logger.info(f"Resuming ZIP {zip_code} harvest at offset {offset}")
+            with open(filename, 'r+b') as f:
+                f.truncate(checkpoint['size'])
+        else:
+            Path(filename).unlink(missing_ok=True)
+            if self.out_fields != '*':
+                columns = self.out_fields.split(',')
+            else:
+                columns = list(self.layer_field_types() or {}) or None
+        
+        for offset, parcels in self.iter_parcel_pages(zip_code, page_size, offset):
+            columns = columns or list(dict.fromkeys(key for parcel in parcels for key in parcel))
+            new_file = not Path(filename).exists()
+            with opener(filename, 'at', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=columns, restval='', extrasaction='ignore')
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(parcels)
+            with open(filename, 'rb') as f:
+                os.fsync(f.fileno())
+            self._save_checkpoint(checkpoint_file, {
+                'zip_code': zip_code,
+                'output': str(filename),
+                'offset': offset,
+                'size': Path(filename).stat().st_size,
+                'columns': columns
+            })
+        
+        if checkpoint_file:
+            Path(checkpoint_file).unlink(missing_ok=True)
+        logger.info(f"Harvested {offset} parcels in ZIP {zip_code} to {filename}")
+        return offset
+    
+    def search_parcels_by_zip(self, zip_code, page_size=1000):
+        """Get all parcels in a ZIP code."""
         try:
             logger.info(f"Searching parcels in ZIP {zip_code}...")
-            response = requests.get(query_url, params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            parcels = []
-            for feature in data.get('features', []):
-                parcels.append(feature['attributes'])
-            
+            parcels = list(self.iter_parcels_by_zip(zip_code, page_size))
             logger.info(f"Found {len(parcels)} parcels")
             return parcels
         except Exception as e:
             logger.error(f"Error searching parcels: {e}")
             return []
     
-    def export_to_csv(self, data, filename=None):
-        """Export to CSV."""
-        if not data:
-            logger.warning("No data to export")
+    def layer_field_types(self):
+        """Field name -> esriFieldType* for the parcel layer, or None if unavailable."""
+        try:
+            layer = self.fetcher.get_json(self.parcels_url, {'f': 'json'})
+        except CountyAPIError as e:
+            logger.warning(f"Layer info unavailable ({e}); inferring export types")
             return None
+        return {field['name']: field.get('type') for field in layer.get('fields', [])}
+    
+    def _load_checkpoint(self, checkpoint_file, zip_code, filename):
+        """The saved harvest state for this ZIP and output, or {} to start over."""
+        if not checkpoint_file:
+            return {}
+        try:
+            with open(checkpoint_file, 'r') as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return {}
+        if checkpoint.get('zip_code') != zip_code or checkpoint.get('output') != str(filename):
+            return {}
+        if not Path(filename).exists() or Path(filename).stat().st_size < checkpoint.get('size', 0):
+            logger.warning(f"{filename} no longer matches {checkpoint_file}; harvesting from the start")
+            return {}
+        return checkpoint
+    
+    def _save_checkpoint(self, checkpoint_file, checkpoint):
+        if not checkpoint_file:
+            return
+        temp = f"{checkpoint_file}.tmp"
+        with open(temp, 'w') as f:
+            json.dump({**checkpoint, 'updated': datetime.now().isoformat()}, f)
+        os.replace(temp, checkpoint_file)
+    
+    def export_to_csv(self, data, filename=None, fieldnames=None):
+        """Export to CSV (.csv.gz is gzipped, .parquet/.arrow need pyarrow).
         
+        data may be a list or a generator such as iter_parcels_by_zip(); it
+        is streamed to disk rather than held in memory. Returns the filename,
+        or None if there was nothing to export.
+        """
         if filename is None:
             filename = f"baton_rouge_parcels_{datetime.now().strftime('%Y%m%d')}.csv"
         
-        df = pd.DataFrame(data)
-        df.to_csv(filename, index=False)
-        logger.info(f"Exported {len(data)} records to {filename}")
+        # Columnar schemas come from the layer's declared field types
+        field_types = self.layer_field_types() if is_columnar(filename) else None
+        if export(data, filename, fieldnames, field_types=field_types) == 0:
+            logger.warning("No data to export")
+            Path(filename).unlink(missing_ok=True)
+            return None
         return filename
 
 
 if __name__ == "__main__":
     scraper = BatonRougePropertyScraper()
     
-    # Example: Search by ZIP
-    parcels = scraper.search_parcels_by_zip("70808")
-    if parcels:
-        scraper.export_to_csv(parcels)
-        print(f"Found {len(parcels)} properties in ZIP 70808")
+    # Example: Harvest a ZIP to disk; rerunning after an interruption appends to the same file
+    filename = "baton_rouge_parcels_70808.csv.gz"
+    if scraper.harvest_zip("70808", filename, checkpoint_file="harvest_70808.json"):
+        print(f"Exported ZIP 70808 properties to {filename}")
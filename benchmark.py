@@ -0,0 +1,230 @@
+"""
+LOAD-TEST BENCHMARK
+Runs the scraper and monitor against fake_arcgis.py and reports
+requests/sec, per-request p50/p99 latency, check duration and peak RSS
+
+    python benchmark.py                      # 100, 10k and 100k watchlists
+    python benchmark.py --sizes 1000 --latency 0.02 --error-rate 0.01
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+HERE = Path(__file__).resolve().parent
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+@contextmanager
+def fake_server(parcels, latency, error_rate, max_record_count):
+    """Run fake_arcgis.py in its own process so its memory isn't counted."""
+    port = 18000 + os.getpid() % 1000
+    proc = subprocess.Popen(
+        [sys.executable, str(HERE / 'fake_arcgis.py'), '--port', str(port),
+         '--parcels', str(parcels), '--latency', str(latency),
+         '--error-rate', str(error_rate), '--max-record-count', str(max_record_count)],
+        stdout=subprocess.PIPE, text=True
+    )
+    try:
+        proc.stdout.readline()  # ready banner
+        yield f"http://127.0.0.1:{port}/gis/rest/services", f"http://127.0.0.1:{port}/__admin"
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+class LatencyRecorder:
+    """Wraps a fetcher's get_json to time every call."""
+
+    def __init__(self, fetcher):
+        self.samples = []
+        self.lock = threading.Lock()
+        original = fetcher.get_json
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.samples.append(time.perf_counter() - start)
+
+        fetcher.get_json = timed
+
+    def reset(self):
+        with self.lock:
+            samples, self.samples = self.samples, []
+        return samples
+
+
+def server_requests(admin):
+    return requests.get(f"{admin}/stats", timeout=10).json()['requests']
+
+
+def summarize(name, samples, elapsed, requests_made, **extra):
+    result = {
+        'stage': name,
+        'seconds': round(elapsed, 3),
+        'requests': requests_made,
+        'requests_per_sec': round(requests_made / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(samples, 50) * 1000, 2),
+        'p99_ms': round(percentile(samples, 99) * 1000, 2),
+    }
+    result.update(extra)
+    return result
+
+
+def run_one(size, args):
+    """Benchmark one watchlist size inside a scratch working directory."""
+    results = []
+    parcels = max(size, args.zip_parcels)
+    with fake_server(parcels, args.latency, args.error_rate, args.max_record_count) as (gis_base, admin), \
+            tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        config = {
+            'gis_base': gis_base,
+            'fetch': {'max_workers': args.workers, 'requests_per_second': args.rps, 'batch_size': args.batch_size},
+            'cache': {'enabled': False}
+        }
+        Path('config.json').write_text(json.dumps(config))
+
+        sys.path.insert(0, str(HERE))
+        import logging
+        logging.disable(logging.INFO)
+        from monitor_service import PropertyMonitor
+        from baton_rouge_scraper import BatonRougePropertyScraper
+        from fetch_engine import BatchFetcher
+
+        # ZIP harvest throughput
+        scraper = BatonRougePropertyScraper(BatchFetcher(args.workers, args.rps), gis_base=gis_base)
+        recorder = LatencyRecorder(scraper.fetcher)
+        before = server_requests(admin)
+        start = time.perf_counter()
+        harvested = sum(1 for _ in scraper.iter_parcels_by_zip('70808'))
+        elapsed = time.perf_counter() - start
+        results.append(summarize('zip_harvest', recorder.reset(), elapsed,
+                                 server_requests(admin) - before - 1, parcels=harvested))
+
+        # Seed the watchlist straight into the store
+        monitor = PropertyMonitor()
+        now = datetime.now().isoformat()
+        monitor.store.upsert_tracked([
+            {
+                'id': f"prop_{i:07d}",
+                'search_value': f"{i:07d}",
+                'search_type': 'assessment',
+                'added_date': now,
+                'current_data': {'ASSESSMENT_NUM': f"{i:07d}"},
+                'status': 'active'
+            }
+            for i in range(1, size + 1)
+        ])
+        monitor.load_state()
+        recorder = LatencyRecorder(monitor.fetcher)
+
+        # Single lookups
+        lookups = min(size, args.lookups)
+        before = server_requests(admin)
+        start = time.perf_counter()
+        for i in range(1, lookups + 1):
+            monitor.fetch_property_data(f"{i:07d}", 'assessment')
+        elapsed = time.perf_counter() - start
+        results.append(summarize('fetch_property_data', recorder.reset(), elapsed,
+                                 server_requests(admin) - before - 1))
+
+        # Full checks: the first takes the baseline, later ones see mutations
+        durations = []
+        for run in range(args.checks):
+            if run:
+                requests.get(f"{admin}/mutate", params={'fraction': args.mutate}, timeout=30)
+            before = server_requests(admin)
+            start = time.perf_counter()
+            changes = monitor.check_all_properties()
+            elapsed = time.perf_counter() - start
+            durations.append(elapsed)
+            results.append(summarize(f"check_all_properties#{run + 1}", recorder.reset(), elapsed,
+                                     server_requests(admin) - before - 1,
+                                     properties=size, changes=len(changes),
+                                     properties_per_sec=round(size / elapsed, 1)))
+
+    return {
+        'watchlist': size,
+        'stages': results,
+        'check_p50_s': round(percentile(durations, 50), 3),
+        'check_p99_s': round(percentile(durations, 99), 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def print_report(report):
+    print(f"\n=== watchlist {report['watchlist']:,} | peak RSS {report['peak_rss_mb']} MB | "
+          f"check p50 {report['check_p50_s']}s p99 {report['check_p99_s']}s ===")
+    print(f"{'stage':28} {'sec':>8} {'reqs':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}  extra")
+    for stage in report['stages']:
+        extra = {k: v for k, v in stage.items()
+                 if k not in ('stage', 'seconds', 'requests', 'requests_per_sec', 'p50_ms', 'p99_ms')}
+        print(f"{stage['stage']:28} {stage['seconds']:>8} {stage['requests']:>7} "
+              f"{stage['requests_per_sec']:>9} {stage['p50_ms']:>8} {stage['p99_ms']:>8}  {extra}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=str, default='100,10000,100000')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--max-record-count', type=int, default=1000)
+    parser.add_argument('--zip-parcels', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rps', type=float, default=0)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--lookups', type=int, default=50)
+    parser.add_argument('--checks', type=int, default=3)
+    parser.add_argument('--mutate', type=float, default=0.01)
+    parser.add_argument('--json', type=str, help='also write the raw results here')
+    parser.add_argument('--run-one', type=int, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(args.run_one, args)))
+        sys.exit(0)
+
+    # Each size runs in a fresh interpreter so peak RSS is per watchlist
+    reports = []
+    for size in (int(s) for s in args.sizes.split(',')):
+        cmd = [sys.executable, str(Path(__file__).resolve()), '--run-one', str(size)]
+        for flag in ('latency', 'error_rate', 'max_record_count', 'zip_parcels', 'workers',
+                     'rps', 'batch_size', 'lookups', 'checks', 'mutate'):
+            cmd += [f"--{flag.replace('_', '-')}", str(getattr(args, flag))]
+        output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        reports.append(report)
+        print_report(report)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, indent=2))
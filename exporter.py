@@ -0,0 +1,157 @@
+"""
+STREAMING EXPORT
+Writes parcel records to CSV (optionally gzipped) or Parquet/Arrow in
+bounded memory; pyarrow is only needed for the columnar formats
+"""
+
+import csv
+import gzip
+import json
+import tempfile
+import logging
+from itertools import islice
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+# Arrow type (pyarrow factory name) for each ArcGIS field type; dates are epoch ms
+ESRI_ARROW_TYPES = {
+    'esriFieldTypeOID': 'int64', 'esriFieldTypeSmallInteger': 'int32',
+    'esriFieldTypeInteger': 'int64', 'esriFieldTypeBigInteger': 'int64',
+    'esriFieldTypeSingle': 'float64', 'esriFieldTypeDouble': 'float64',
+    'esriFieldTypeDate': 'int64', 'esriFieldTypeString': 'string',
+    'esriFieldTypeGUID': 'string', 'esriFieldTypeGlobalID': 'string'
+}
+
+
+def spool_rows(rows):
+    """Spool rows to a temporary JSON-lines file, collecting the column union.
+    
+    Returns (columns in first-seen order, row count, open spool file
+    rewound to the start). The caller closes the spool.
+    """
+    columns = {}
+    count = 0
+    spool = tempfile.TemporaryFile('w+', encoding='utf-8')
+    for row in rows:
+        for key in row:
+            if key not in columns:
+                columns[key] = None
+        spool.write(json.dumps(row, default=str))
+        spool.write('\n')
+        count += 1
+    spool.seek(0)
+    return list(columns), count, spool
+
+
+def _with_columns(rows, fieldnames):
+    """(fieldnames, row iterator, spool or None); spools only when columns are unknown."""
+    if fieldnames:
+        return list(fieldnames), iter(rows), None
+    columns, _, spool = spool_rows(rows)
+    return columns, (json.loads(line) for line in spool), spool
+
+
+def write_csv(rows, filename, fieldnames=None, compression=None):
+    """Stream rows to CSV; gzip when compression='gzip' or the name ends in .gz.
+    
+    Without fieldnames the rows are spooled to disk first so the header
+    is the union of every row's columns. Returns the number of rows.
+    """
+    columns, records, spool = _with_columns(rows, fieldnames)
+    gzipped = compression == 'gzip' or str(filename).endswith('.gz')
+    opener = gzip.open if gzipped else open
+    count = 0
+    try:
+        with opener(filename, 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=columns, restval='', extrasaction='ignore')
+            writer.writeheader()
+            for row in records:
+                writer.writerow(row)
+                count += 1
+    finally:
+        if spool:
+            spool.close()
+    return count
+
+
+def _arrow_schema(sample, columns, field_types=None):
+    """Arrow schema from the layer's field types (name -> esriFieldType*).
+    
+    Columns the layer doesn't describe are inferred from the first chunk,
+    with integers widened to float64 since a later chunk may hold
+    fractions; all-null columns become strings.
+    """
+    field_types = field_types or {}
+    inferred = pa.Table.from_pylist(sample).schema if sample else pa.schema([])
+    fields = []
+    for name in columns:
+        if field_types.get(name) in ESRI_ARROW_TYPES:
+            fields.append(pa.field(name, getattr(pa, ESRI_ARROW_TYPES[field_types[name]])()))
+            continue
+        index = inferred.get_field_index(name)
+        kind = inferred.field(index).type if index >= 0 else pa.string()
+        if pa.types.is_null(kind):
+            kind = pa.string()
+        elif pa.types.is_integer(kind):
+            kind = pa.float64()
+        fields.append(pa.field(name, kind))
+    return pa.schema(fields)
+
+
+def write_columnar(rows, filename, fieldnames=None, row_group_size=50000, field_types=None):
+    """Stream rows to Parquet (.parquet) or Arrow IPC (.arrow/.feather) in row groups.
+    
+    field_types maps column names to ArcGIS field types (the layer's
+    fields) so the schema doesn't hinge on the first row group.
+    Requires pyarrow. Returns the number of rows.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required for Parquet/Arrow export (pip install pyarrow)")
+    
+    columns, records, spool = _with_columns(rows, fieldnames)
+    parquet = not str(filename).endswith(('.arrow', '.feather'))
+    writer = None
+    count = 0
+    try:
+        while True:
+            chunk = list(islice(records, row_group_size))
+            if not chunk and writer is not None:
+                break
+            if writer is None:
+                schema = _arrow_schema(chunk, columns, field_types)
+                writer = (pq.ParquetWriter(filename, schema, compression='zstd') if parquet
+                          else pa.ipc.new_file(filename, schema))
+            if not chunk:
+                break
+            table = pa.Table.from_pylist([{c: row.get(c) for c in columns} for row in chunk], schema=schema)
+            if parquet:
+                writer.write_table(table)
+            else:
+                writer.write(table)
+            count += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+        if spool:
+            spool.close()
+    return count
+
+
+def is_columnar(filename):
+    return str(filename).endswith(('.parquet', '.arrow', '.feather'))
+
+
+def export(rows, filename, fieldnames=None, chunk_size=50000, field_types=None):
+    """Pick the writer from the file extension (.csv, .csv.gz, .parquet, .arrow)."""
+    if is_columnar(filename):
+        count = write_columnar(rows, filename, fieldnames, chunk_size, field_types)
+    else:
+        count = write_csv(rows, filename, fieldnames)
+    logger.info(f"Exported {count} records to {filename}")
+    return count
@@ -0,0 +1,349 @@
+"""
+FAKE ARCGIS SERVER
+Local stand-in for the maps.brla.gov MapServer/GeocodeServer endpoints,
+serving synthetic parcels with configurable size, latency, paging limits
+and error rate. Used by benchmark.py; never talks to the county.
+
+    python fake_arcgis.py --parcels 10000 --latency 0.05 --port 8765
+    PROPERTY_MONITOR_GIS_BASE=http://127.0.0.1:8765/gis/rest/services python monitor_service.py --check
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import calendar
+import json
+import random
+import re
+import socket
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+ZIP_CODES = ['70801', '70802', '70805', '70806', '70808', '70809', '70810', '70811', '70815', '70816']
+STREETS = ['GOVERNMENT', 'PERKINS', 'JEFFERSON', 'FLORIDA', 'NICHOLSON', 'HIGHLAND', 'ESSEN', 'SHERWOOD FOREST']
+SUFFIXES = ['ST', 'RD', 'HWY', 'BLVD', 'DR', 'AVE']
+OWNERS = ['SMITH JOHN', 'JOHNSON MARY', 'WILLIAMS LLC', 'BROWN TRUST', 'JONES ROBERT', 'GARCIA PROPERTIES']
+ZONING = ['A1', 'A2', 'A3.1', 'C1', 'C2', 'M1', 'RE/A1']
+
+# Synthetic points sit on a grid keyed by OBJECTID so point queries can
+# be answered without real geometry
+X_ORIGIN, Y_ORIGIN, CELL = 3300000.0, 700000.0, 100.0
+GRID_WIDTH = 1000
+
+CLAUSE_PATTERNS = [
+    (re.compile(r"^1\s*=\s*1$"), lambda m: lambda p: True),
+    (re.compile(r"^(\w+)\s*=\s*'([^']*)'$", re.I),
+     lambda m: lambda p: str(p.get(m.group(1))) == m.group(2)),
+    (re.compile(r"^(\w+)\s+IN\s*\((.*)\)$", re.I | re.S),
+     lambda m: (lambda values: lambda p: str(p.get(m.group(1))) in values)(
+         set(v.replace("''", "'") for v in re.findall(r"'((?:[^']|'')*)'", m.group(2))))),
+    (re.compile(r"^(\w+)\s+LIKE\s+'%(.*)%'$", re.I),
+     lambda m: lambda p: m.group(2).upper() in str(p.get(m.group(1), '')).upper()),
+    (re.compile(r"^(\w+)\s*>\s*(?:timestamp\s+|date\s+)?'?([^']*)'?$", re.I),
+     lambda m: lambda p: (p.get(m.group(1)) or 0) > _parse_date(m.group(2))),
+]
+
+
+def _parse_date(text):
+    """Epoch ms from an ArcGIS timestamp literal (UTC) or a bare number."""
+    text = text.strip()
+    if re.fullmatch(r"\d+(\.\d+)?", text):
+        return float(text)
+    return calendar.timegm(time.strptime(text[:19], '%Y-%m-%d %H:%M:%S')) * 1000
+
+
+def compile_where(where):
+    """Turn the small SQL subset the monitor sends into a predicate."""
+    predicates = []
+    for clause in re.split(r"\s+AND\s+", where.strip(), flags=re.I):
+        clause = clause.strip()
+        for pattern, build in CLAUSE_PATTERNS:
+            match = pattern.match(clause)
+            if match:
+                predicates.append(build(match))
+                break
+        else:
+            raise ValueError(f"Unsupported where clause: {clause}")
+    return lambda parcel: all(pred(parcel) for pred in predicates)
+
+
+class FakeParcelData:
+    def __init__(self, parcel_count=1000, max_record_count=1000, edit_tracking=True, seed=0):
+        self.max_record_count = max_record_count
+        self.edit_tracking = edit_tracking
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.parcels = [self.make_parcel(i) for i in range(1, parcel_count + 1)]
+        self.by_assessment = {p['ASSESSMENT_NUM']: p for p in self.parcels}
+        self.by_address = {}
+        for parcel in self.parcels:
+            self.by_address.setdefault(parcel['PHYSICAL_ADDRESS'], parcel)
+    
+    def make_parcel(self, object_id):
+        rng = self.rng
+        zip_code = ZIP_CODES[object_id % len(ZIP_CODES)]
+        land = rng.randrange(5000, 200000, 100)
+        improvement = rng.randrange(0, 600000, 100)
+        return {
+            'OBJECTID': object_id,
+            'ASSESSMENT_NUM': f"{object_id:07d}",
+            'PHYSICAL_ADDRESS': f"{100 + object_id % 9000} {STREETS[object_id % len(STREETS)]} "
+                                f"{SUFFIXES[object_id % len(SUFFIXES)]}",
+            'ZIP': zip_code,
+            'OWNER': OWNERS[rng.randrange(len(OWNERS))],
+            'OWNER_CITY_STATE_ZIP': f"BATON ROUGE LA {zip_code}",
+            'LAND_VALUE': land,
+            'IMPROVEMENT_VALUE': improvement,
+            'ASSESSED_VALUE': land + improvement,
+            'ZONING': ZONING[rng.randrange(len(ZONING))],
+            'SALE_DATE': 1262304000000 + rng.randrange(0, 5000) * 86400000,
+            'SALE_PRICE': rng.randrange(50000, 900000, 500),
+            'LAST_EDITED_DATE': 1577836800000
+        }
+    
+    def point_for(self, parcel):
+        i = parcel['OBJECTID']
+        return {'x': X_ORIGIN + (i % GRID_WIDTH) * CELL + CELL / 2,
+                'y': Y_ORIGIN + (i // GRID_WIDTH) * CELL + CELL / 2}
+    
+    def parcel_at(self, x, y):
+        object_id = int((y - Y_ORIGIN) // CELL) * GRID_WIDTH + int((x - X_ORIGIN) // CELL)
+        if 1 <= object_id <= len(self.parcels):
+            return self.parcels[object_id - 1]
+        return None
+    
+    def polygon_for(self, parcel):
+        point = self.point_for(parcel)
+        x0, y0 = point['x'] - CELL / 2, point['y'] - CELL / 2
+        x1, y1 = x0 + CELL, y0 + CELL
+        return {'rings': [[[x0, y0], [x0, y1], [x1, y1], [x1, y0], [x0, y0]]]}
+    
+    def mutate(self, fraction):
+        """Change the owner and value of a random share of parcels."""
+        now = int(time.time() * 1000)
+        with self.lock:
+            count = int(len(self.parcels) * fraction)
+            for parcel in self.rng.sample(self.parcels, count):
+                parcel['OWNER'] = OWNERS[self.rng.randrange(len(OWNERS))] + ' II'
+                parcel['ASSESSED_VALUE'] += 1000
+                parcel['LAST_EDITED_DATE'] = now
+        return count
+    
+    def layer_info(self):
+        info = {
+            'name': 'Tax_Parcel',
+            'maxRecordCount': self.max_record_count,
+            'objectIdField': 'OBJECTID',
+            'fields': [{'name': name} for name in self.parcels[0]] if self.parcels else []
+        }
+        if self.edit_tracking:
+            info['editFieldsInfo'] = {'editDateField': 'LAST_EDITED_DATE'}
+        return info
+    
+    def query(self, params):
+        if 'geometry' in params:
+            matches = self.spatial_matches(params)
+        elif params.get('objectIds'):
+            ids = {int(i) for i in params['objectIds'].split(',') if i}
+            matches = [p for p in self.parcels if p['OBJECTID'] in ids]
+        else:
+            where = params.get('where', '1=1')
+            clauses = re.split(r"\s+AND\s+", where.strip(), maxsplit=1, flags=re.I)
+            keyed = re.match(r"^ASSESSMENT_NUM\s*(=|IN)\s*\(?('.*')\)?$", clauses[0], re.I | re.S)
+            if keyed:
+                values = [v.replace("''", "'") for v in re.findall(r"'((?:[^']|'')*)'", keyed.group(2))]
+                matches = [self.by_assessment[v] for v in values if v in self.by_assessment]
+                if len(clauses) > 1:
+                    predicate = compile_where(clauses[1])
+                    matches = [p for p in matches if predicate(p)]
+            else:
+                predicate = compile_where(where)
+                matches = [p for p in self.parcels if predicate(p)]
+        
+        if params.get('returnCountOnly') == 'true':
+            return {'count': len(matches)}
+        if params.get('returnIdsOnly') == 'true':
+            return {'objectIdFieldName': 'OBJECTID', 'objectIds': [p['OBJECTID'] for p in matches]}
+        
+        offset = int(params.get('resultOffset', 0))
+        requested = int(params.get('resultRecordCount', self.max_record_count))
+        page_size = min(requested, self.max_record_count)
+        page = matches[offset:offset + page_size]
+        
+        out_fields = params.get('outFields', '*')
+        fields = None if out_fields == '*' else [f.strip() for f in out_fields.split(',')]
+        geometry = params.get('returnGeometry', 'true') == 'true'
+        
+        features = []
+        for parcel in page:
+            feature = {'attributes': parcel if fields is None else {f: parcel.get(f) for f in fields}}
+            if geometry:
+                feature['geometry'] = self.polygon_for(parcel)
+            features.append(feature)
+        
+        body = {'objectIdFieldName': 'OBJECTID', 'features': features}
+        if offset + len(page) < len(matches):
+            body['exceededTransferLimit'] = True
+        return body
+    
+    def spatial_matches(self, params):
+        geometry = params['geometry']
+        if geometry.startswith('{'):
+            geometry = json.loads(geometry)
+            points = geometry.get('points') or [[geometry['x'], geometry['y']]]
+        else:
+            x, y = geometry.split(',')[:2]
+            points = [[float(x), float(y)]]
+        seen = {}
+        for x, y in points:
+            parcel = self.parcel_at(x, y)
+            if parcel:
+                seen[parcel['OBJECTID']] = parcel
+        return list(seen.values())
+    
+    def geocode(self, address):
+        parcel = self.by_address.get(' '.join(address.split(',')[0].upper().split()))
+        if parcel is None:
+            return None
+        return {'address': parcel['PHYSICAL_ADDRESS'], 'location': self.point_for(parcel), 'score': 100}
+
+
+class FakeArcGISHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes; without this, Nagle
+        # plus delayed ACKs add ~40ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        self.dispatch(parts.path, {k: v[-1] for k, v in parse_qs(parts.query).items()})
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode()
+        params = {k: v[-1] for k, v in parse_qs(body).items()}
+        parts = urlsplit(self.path)
+        params.update({k: v[-1] for k, v in parse_qs(parts.query).items()})
+        self.dispatch(parts.path, params)
+    
+    def dispatch(self, path, params):
+        server = self.server
+        with server.stats_lock:
+            server.stats['requests'] += 1
+        
+        if path.startswith('/__admin/'):
+            return self.admin(path, params)
+        
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and server.rng.random() < server.error_rate:
+            with server.stats_lock:
+                server.stats['errors'] += 1
+            return self.send_json({'error': 'Service Unavailable'}, status=503, headers={'Retry-After': '1'})
+        
+        data = server.data
+        try:
+            if path.endswith('/MapServer/0/query'):
+                body = data.query(params)
+            elif path.endswith('/MapServer/0'):
+                body = data.layer_info()
+            elif path.endswith('/GeocodeServer/findAddressCandidates'):
+                match = data.geocode(params.get('SingleLine', ''))
+                body = {'candidates': [match] if match else []}
+            elif path.endswith('/GeocodeServer/geocodeAddresses'):
+                records = json.loads(params.get('addresses', '{}')).get('records', [])
+                locations = []
+                for record in records:
+                    attrs = record['attributes']
+                    match = data.geocode(attrs.get('SingleLine') or attrs.get('Address', ''))
+                    location = {'attributes': {'ResultID': attrs.get('OBJECTID'), 'Score': 0}}
+                    if match:
+                        location = {'location': match['location'],
+                                    'attributes': {'ResultID': attrs.get('OBJECTID'), 'Score': 100}}
+                    locations.append(location)
+                body = {'locations': locations}
+            else:
+                return self.send_json({'error': {'code': 404, 'message': 'Not found'}}, status=404)
+        except ValueError as e:
+            body = {'error': {'code': 400, 'message': str(e)}}
+        self.send_json(body)
+    
+    def admin(self, path, params):
+        server = self.server
+        if path == '/__admin/stats':
+            with server.stats_lock:
+                self.send_json(dict(server.stats))
+        elif path == '/__admin/mutate':
+            self.send_json({'mutated': server.data.mutate(float(params.get('fraction', 0.01)))})
+        elif path == '/__admin/config':
+            if 'latency' in params:
+                server.latency = float(params['latency'])
+            if 'error_rate' in params:
+                server.error_rate = float(params['error_rate'])
+            self.send_json({'latency': server.latency, 'error_rate': server.error_rate})
+        else:
+            self.send_json({'error': 'unknown admin path'}, status=404)
+    
+    def send_json(self, body, status=200, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeArcGISServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, port=0, parcel_count=1000, latency=0.0, error_rate=0.0,
+                 max_record_count=1000, edit_tracking=True, seed=0):
+        super().__init__(('127.0.0.1', port), FakeArcGISHandler)
+        self.data = FakeParcelData(parcel_count, max_record_count, edit_tracking, seed)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.stats = {'requests': 0, 'errors': 0}
+        self.stats_lock = threading.Lock()
+    
+    @property
+    def gis_base(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/gis/rest/services"
+    
+    def start(self):
+        """Serve on a daemon thread; returns self for chaining."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--parcels', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--max-record-count', type=int, default=1000)
+    parser.add_argument('--no-edit-tracking', action='store_true')
+    
+    args = parser.parse_args()
+    server = FakeArcGISServer(
+        args.port, args.parcels, args.latency, args.error_rate,
+        args.max_record_count, not args.no_edit_tracking
+    )
+    print(f"Fake ArcGIS serving {args.parcels} parcels at {server.gis_base}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,293 @@
+"""
+BATCH FETCH ENGINE
+Pooled HTTP session, per-host rate limiting, retries with backoff,
+a circuit breaker and concurrent fetches shared by PropertyMonitor
+and BatonRougePropertyScraper
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import random
+import threading
+import time
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = metrics.counter(
+    'county_requests_total', 'County API lookups by endpoint and outcome', ('endpoint', 'outcome')
+)
+LATENCY = metrics.histogram(
+    'county_request_seconds', 'County API round-trip time per attempt', ('endpoint',)
+)
+
+# HTTP statuses and ArcGIS error codes worth retrying
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_ARCGIS_CODES = {500, 503, 504}
+
+
+class CountyAPIError(Exception):
+    """A county API request failed, as opposed to matching nothing."""
+
+
+class TransientAPIError(CountyAPIError):
+    """A failure that may succeed on retry (5xx, 429, timeouts, resets)."""
+    
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ArcGISError(CountyAPIError):
+    """The server answered, but with an ArcGIS error payload."""
+
+
+class CircuitOpenError(CountyAPIError):
+    """The county server has been failing and requests are paused."""
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def endpoint_name(url):
+    """Metric label for a county URL: the path below /rest/services/."""
+    path = urlsplit(url).path
+    return path.split('/rest/services/', 1)[-1].strip('/') or path
+
+
+class CircuitBreaker:
+    """Pauses requests after repeated failures.
+    
+    After failure_threshold consecutive transient failures the circuit
+    opens for reset_timeout seconds; then a single probe request is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+    
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+    
+    def wait(self, max_pause):
+        """Block while the circuit is open; raise CircuitOpenError past max_pause.
+        
+        Returns True when the caller is the half-open probe.
+        """
+        deadline = time.monotonic() + max_pause
+        while True:
+            with self.lock:
+                if self.opened_at is None:
+                    return False
+                now = time.monotonic()
+                reopens = self.opened_at + self.reset_timeout
+                if now >= reopens and not self.probing:
+                    self.probing = True
+                    return True
+                delay = max(reopens - now, 0.5)
+            if now + delay > deadline:
+                raise CircuitOpenError(f"County API circuit open ({self.failures} consecutive failures)")
+            logger.warning(f"County API degraded; pausing {delay:.1f}s")
+            time.sleep(delay)
+    
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info("County API recovered; circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+    
+    def release_probe(self):
+        """Let another probe through after one ended without a verdict."""
+        with self.lock:
+            self.probing = False
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                if self.opened_at is None:
+                    logger.warning(f"County API failing; circuit opened for {self.reset_timeout}s")
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+
+class RateLimiter:
+    """Spaces requests to each host at most 1/rate seconds apart."""
+    
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+    
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class BatchFetcher:
+    def __init__(self, max_workers=8, requests_per_second=10, timeout=30, session=None, cache=None,
+                 max_attempts=4, backoff_base=0.5, backoff_max=30, breaker=None, max_pause=300):
+        self.max_workers = max_workers
+        self.cache = cache
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.max_pause = max_pause
+        self.timeout = timeout
+        self.session = session or self.create_session(max_workers)
+        self.rate_limiter = RateLimiter(requests_per_second)
+    
+    @staticmethod
+    def create_session(pool_size):
+        """Session whose connection pool can serve every worker at once."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def get_json(self, url, params=None, data=None, revalidate=False):
+        """GET url (or POST when form data is given) and return the JSON body.
+        
+        With a response cache, fresh entries are served without a request
+        and stale ones are revalidated with If-None-Match/If-Modified-Since.
+        revalidate treats every cached entry as stale, for callers that
+        must see the server's current data.
+        Transient failures are retried with jittered exponential backoff
+        (honouring Retry-After); anything still failing raises a
+        CountyAPIError rather than looking like an empty result.
+        """
+        method = 'GET' if data is None else 'POST'
+        endpoint = endpoint_name(url)
+        cached = self.cache.get(method, url, params or data) if self.cache else None
+        if cached and cached.fresh and not revalidate:
+            REQUESTS.inc(endpoint=endpoint, outcome='cached')
+            return cached.body
+        headers = cached.validators() if cached else {}
+        
+        attempt = 0
+        while True:
+            attempt += 1
+            probe = self.breaker.wait(self.max_pause)
+            self.rate_limiter.wait(urlsplit(url).netloc)
+            try:
+                with LATENCY.time(endpoint=endpoint):
+                    response = self._send(url, params, data, headers)
+                if response.status_code == 304 and cached:
+                    self.breaker.record_success()
+                    self.cache.revalidated(cached, url)
+                    REQUESTS.inc(endpoint=endpoint, outcome='not_modified')
+                    return cached.body
+                body = self._parse(response)
+            except TransientAPIError as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_attempts:
+                    REQUESTS.inc(endpoint=endpoint, outcome='failed')
+                    raise
+                REQUESTS.inc(endpoint=endpoint, outcome='retried')
+                delay = self.backoff(attempt, e.retry_after)
+                logger.warning(f"{e}; retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            except CountyAPIError:
+                # The server is up, it just refused this request
+                self.breaker.record_success()
+                REQUESTS.inc(endpoint=endpoint, outcome='rejected')
+                raise
+            except BaseException:
+                # Nothing recorded an outcome, so free the probe slot
+                if probe:
+                    self.breaker.release_probe()
+                raise
+            
+            self.breaker.record_success()
+            REQUESTS.inc(endpoint=endpoint, outcome='ok')
+            if self.cache:
+                self.cache.put(
+                    method, url, params or data, body,
+                    response.headers.get('ETag'), response.headers.get('Last-Modified')
+                )
+            return body
+    
+    def _send(self, url, params, data, headers):
+        try:
+            if data is not None:
+                return self.session.post(url, data=data, headers=headers, timeout=self.timeout)
+            return self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            # Resets, timeouts (SSL errors are ConnectionErrors) and truncated bodies
+            raise TransientAPIError(f"{type(e).__name__} from {urlsplit(url).netloc}") from e
+        except requests.RequestException as e:
+            # Bad URLs, redirect loops and the like fail the same way every time
+            raise CountyAPIError(f"{type(e).__name__} from {urlsplit(url).netloc}: {e}") from e
+    
+    def _parse(self, response):
+        """Classify a response: return its JSON body or raise the right error."""
+        if response.status_code in RETRYABLE_STATUS:
+            raise TransientAPIError(
+                f"HTTP {response.status_code} from {urlsplit(response.url).netloc}",
+                parse_retry_after(response.headers.get('Retry-After'))
+            )
+        if response.status_code >= 400:
+            raise CountyAPIError(f"HTTP {response.status_code} from {response.url}")
+        
+        try:
+            body = response.json()
+        except ValueError as e:
+            raise TransientAPIError("Truncated or non-JSON response") from e
+        
+        if isinstance(body, dict) and 'error' in body:
+            error = body['error']
+            code = error.get('code') if isinstance(error, dict) else None
+            if code in RETRYABLE_ARCGIS_CODES:
+                raise TransientAPIError(f"ArcGIS error {code}: {error.get('message')}")
+            raise ArcGISError(error)
+        return body
+    
+    def backoff(self, attempt, retry_after=None):
+        """Exponential backoff with full jitter, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+    
+    def map(self, func, items):
+        """Run func over items concurrently.
+        
+        Yields (item, result, error) in input order; error is None on
+        success so one failed lookup never aborts the batch.
+        """
+        def call(item):
+            try:
+                return item, func(item), None
+            except Exception as e:
+                return item, None, e
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            yield from pool.map(call, items)
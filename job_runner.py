@@ -0,0 +1,114 @@
+"""
+BACKGROUND JOB RUNNER
+Runs long checks and imports off the request thread and tracks their
+progress
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import threading
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JobRunner:
+    def __init__(self, max_workers=1, keep_finished=50):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.keep_finished = keep_finished
+        self.lock = threading.Lock()
+        # Notified on every job update so event streams can wait instead of poll
+        self.updated = threading.Condition(self.lock)
+        self.version = 0
+        self.versions = {}
+        self.jobs = {}
+    
+    def submit(self, name, func, exclusive=True):
+        """Queue func(progress) unless a job with this name is already pending.
+        
+        Returns (job, created); when a matching job is queued or running it
+        is returned instead of starting a duplicate. Jobs that aren't
+        exclusive always queue. func's return value becomes the job's result.
+        """
+        with self.lock:
+            for job in self.jobs.values():
+                if exclusive and job['name'] == name and job['status'] in ('queued', 'running'):
+                    return dict(job), False
+            
+            job = {
+                'id': uuid.uuid4().hex[:12],
+                'name': name,
+                'status': 'queued',
+                'created': datetime.now().isoformat(),
+                'started': None,
+                'finished': None,
+                'done': 0,
+                'total': 0,
+                'changes': 0,
+                'error': None,
+                'result': None
+            }
+            self.jobs[job['id']] = job
+            self._trim()
+            self._changed(job)
+        
+        self.executor.submit(self._run, job, func)
+        logger.info(f"Queued job {job['id']} ({name})")
+        return dict(job), True
+    
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+    
+    def depth(self):
+        """{'queued': n, 'running': n}"""
+        with self.lock:
+            statuses = [job['status'] for job in self.jobs.values()]
+        return {status: statuses.count(status) for status in ('queued', 'running')}
+    
+    def wait(self, version, timeout=None):
+        """Block until a job changes after `version` (or timeout).
+        
+        Returns (current version, copies of the jobs updated since).
+        """
+        with self.updated:
+            self.updated.wait_for(lambda: self.version > version, timeout)
+            updated = [
+                dict(self.jobs[job_id]) for job_id, v in self.versions.items()
+                if v > version and job_id in self.jobs
+            ]
+            return self.version, updated
+    
+    def _changed(self, job):
+        # Caller holds the lock
+        self.version += 1
+        self.versions[job['id']] = self.version
+        self.updated.notify_all()
+    
+    def _run(self, job, func):
+        def progress(done, total, changes):
+            with self.lock:
+                job.update(done=done, total=total, changes=changes)
+                self._changed(job)
+        
+        with self.lock:
+            job.update(status='running', started=datetime.now().isoformat())
+            self._changed(job)
+        result = None
+        try:
+            result = func(progress)
+            status, error = 'done', None
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}")
+            status, error = 'failed', str(e)
+        with self.lock:
+            job.update(status=status, error=error, result=result, finished=datetime.now().isoformat())
+            self._changed(job)
+    
+    def _trim(self):
+        finished = [j for j in self.jobs.values() if j['status'] in ('done', 'failed')]
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job['id']]
+            self.versions.pop(job['id'], None)
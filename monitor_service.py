@@ -2,18 +2,26 @@
 AUTOMATED PROPERTY MONITORING SERVICE - NO PANDAS VERSION
 """
 
-import requests
 import json
 import time
 import csv
-from datetime import datetime, timedelta
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from datetime import datetime, timedelta, timezone
 import logging
-import schedule
 from pathlib import Path
 import hashlib
+import os
+import threading
+from contextlib import nullcontext
+from urllib.parse import urlencode
+from fetch_engine import BatchFetcher, CircuitBreaker, CountyAPIError
+from property_store import PropertyStore
+from response_cache import ResponseCache
+from parcel_index import ParcelIndex
+from snapshot_store import Snapshot, SnapshotStore, SnapshotWriter
+from snapshot_diff import diff_snapshots
+from baton_rouge_scraper import ZIP_CODE, BatonRougePropertyScraper, find_column, quote
+from alerts import AlertDispatcher
+import metrics
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,6 +33,101 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# ArcGIS rejects GET URLs much past 2k characters; larger queries are POSTed
+MAX_GET_URL_LENGTH = 2000
+
+# Most recent change records kept in memory for the dashboard
+RECENT_CHANGES = 500
+
+# Watchlist import: search types by name, also the CSV columns that imply one
+IMPORT_TYPES = {'address': 'address', 'assessment': 'assessment', 'assessment_num': 'assessment', 'zip': 'zip'}
+
+# Result placeholder for parcels an incremental check found unedited
+UNCHANGED = object()
+
+STAGE_SECONDS = metrics.histogram(
+    'check_stage_seconds', 'Time spent per check stage (fetch, diff, persist)', ('stage', 'kind')
+)
+CHECK_SECONDS = metrics.histogram('check_duration_seconds', 'Wall time of whole check runs (manual or scheduled scan)')
+CHECKED = metrics.counter('checked_entries_total', 'Tracked entries checked, by outcome', ('outcome',))
+CHECK_RATE = metrics.gauge('check_entries_per_second', 'Entries per second over the last whole check run')
+CHANGES = metrics.counter('change_records_total', 'Change records written')
+CACHE = metrics.gauge('response_cache', 'Response cache counters and size (see ResponseCache.stats)', ('stat',))
+TRACKED = metrics.gauge('tracked_entries', 'Entries on the watchlist')
+
+
+def record_check_run(entries, elapsed):
+    """Record a whole run; shards are batches within it, not checks of their own."""
+    CHECK_SECONDS.observe(elapsed)
+    CHECK_RATE.set(round(entries / elapsed, 1) if elapsed else 0)
+
+
+def hash_value(value):
+    """Short, stable digest of a JSON-serializable value."""
+    encoded = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+def hash_fields(attributes):
+    """Per-field digests of a parcel's attributes."""
+    return {field: hash_value(value) for field, value in attributes.items()}
+
+
+def digest_fields(attributes, fields):
+    """Fixed-width per-field digest string, one 6-hex slot per field."""
+    return ''.join(hash_value(attributes.get(f))[:6] for f in fields)
+
+
+def diff_digests(old_digest, old_fields, new_digest, new_fields):
+    """Names of fields whose slots differ between two digest strings."""
+    old_slots = {f: old_digest[i * 6:i * 6 + 6] for i, f in enumerate(old_fields)}
+    new_slots = {f: new_digest[i * 6:i * 6 + 6] for i, f in enumerate(new_fields)}
+    return diff_fields(old_slots, new_slots)
+
+
+def diff_fields(old_hashes, new_hashes):
+    """Names of fields whose digests differ, including added/removed fields."""
+    fields = old_hashes.keys() | new_hashes.keys()
+    return sorted(f for f in fields if old_hashes.get(f) != new_hashes.get(f))
+
+
+def project(attributes, fields):
+    """Just the given fields of a parcel (all of them when fields is None)."""
+    if fields is None:
+        return attributes
+    return {field: attributes.get(field) for field in fields}
+
+
+def read_watchlist(lines, default_type='address'):
+    """Yield (search_value, search_type) rows from CSV lines (a file or a list).
+    
+    Recognised headers are value/search_value with an optional type/
+    search_type column, or a column named address, assessment_num or zip.
+    Without one, the first column of every row is a value of default_type.
+    """
+    header, value_column, rows = find_column(lines, ['value', 'search_value', *IMPORT_TYPES])
+    type_column = None
+    implied = None
+    if header:
+        type_column = next((header.index(c) for c in ('type', 'search_type') if c in header), None)
+        implied = IMPORT_TYPES.get(header[value_column])
+    
+    for row in rows:
+        if len(row) <= value_column or not row[value_column].strip():
+            continue
+        search_type = implied or default_type
+        if type_column is not None and len(row) > type_column and row[type_column].strip():
+            search_type = row[type_column].strip()
+        yield row[value_column].strip(), search_type
+
+
+def high_water(values, current=None):
+    """Latest edit date (epoch ms) among values and current, or None."""
+    dates = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    if current is not None:
+        dates.append(current)
+    return max(dates) if dates else None
+
 
 class PropertyMonitor:
     def __init__(self, config_file='config.json'):
@@ -32,8 +135,51 @@ class PropertyMonitor:
         self.load_config()
         self.setup_data_storage()
         
-        self.gis_base = "https://maps.brla.gov/gis/rest/services"
+        fetch_config = self.config.get('fetch', {})
+        cache_config = self.config.get('cache', {})
+        self.cache = None
+        if cache_config.get('enabled', True):
+            self.cache = ResponseCache(
+                cache_config.get('db_file', 'data/http_cache.db'),
+                max_mb=cache_config.get('max_mb', 200),
+                ttls=cache_config.get('ttls')
+            )
+        self.fetcher = BatchFetcher(
+            max_workers=fetch_config.get('max_workers', 8),
+            requests_per_second=fetch_config.get('requests_per_second', 10),
+            cache=self.cache,
+            max_attempts=fetch_config.get('max_attempts', 4),
+            backoff_base=fetch_config.get('backoff_base', 0.5),
+            breaker=CircuitBreaker(
+                fetch_config.get('breaker_threshold', 5),
+                fetch_config.get('breaker_reset', 30)
+            ),
+            max_pause=fetch_config.get('max_pause', 300)
+        )
+        
+        index_config = self.config.get('index', {})
+        self.index = None
+        if index_config.get('enabled', True):
+            self.index = ParcelIndex(index_config.get('db_file', 'data/parcel_index.db'))
+        
+        snapshot_config = self.config.get('snapshots', {})
+        self.snapshots = SnapshotStore(
+            snapshot_config.get('dir', 'data/snapshots'),
+            keep=snapshot_config.get('keep', 30)
+        )
+        self.alerts = AlertDispatcher(self.store, self.config.get('alerts', {}).get('email', {}))
+        
+        self.gis_base = (
+            self.config.get('gis_base')
+            or os.environ.get('PROPERTY_MONITOR_GIS_BASE')
+            or "https://maps.brla.gov/gis/rest/services"
+        )
         self.parcels_url = f"{self.gis_base}/Cadastral/Tax_Parcel/MapServer/0"
+        # Batch geocoding for imports; only the parcel's ASSESSMENT_NUM is needed from it
+        self.scraper = BatonRougePropertyScraper(self.fetcher, self.gis_base, fields=['ASSESSMENT_NUM'])
+        self.layer = None
+        self.layer_retry_at = 0
+        self.unknown_fields = set()
         
         logger.info("Property Monitor initialized")
     
@@ -51,8 +197,36 @@ class PropertyMonitor:
     
     def get_default_config(self):
         return {
-            "monitoring": {"check_frequency": "daily", "check_time": "09:00"},
-            "alerts": {"email": {"enabled": False}}
+            "monitoring": {
+                "check_frequency": "daily", "check_time": "09:00",
+                "fields": [
+                    "OWNER", "OWNER_CITY_STATE_ZIP", "PHYSICAL_ADDRESS", "ZIP", "ZONING",
+                    "LAND_VALUE", "IMPROVEMENT_VALUE", "ASSESSED_VALUE", "SALE_DATE", "SALE_PRICE"
+                ],
+                "watch_fields": {},
+                "watch_frequency": {}
+            },
+            "fetch": {
+                "max_workers": 8, "requests_per_second": 10, "batch_size": 500,
+                "max_attempts": 4, "backoff_base": 0.5,
+                "breaker_threshold": 5, "breaker_reset": 30, "max_pause": 300
+            },
+            "cache": {"enabled": True, "max_mb": 200, "ttls": {"GeocodeServer": 2592000, "MapServer": 900}},
+            "index": {"enabled": True},
+            "snapshots": {"dir": "data/snapshots", "keep": 30},
+            "delta": {"enabled": True, "overlap_seconds": 300, "full_every_hours": 168},
+            "history": {"retention_days": 365},
+            "scheduler": {
+                "workers": 2, "window_hours": 6, "lease_seconds": 1800,
+                "stagger_seconds": 5, "tick_minutes": 15, "shard_size": 50000
+            },
+            "alerts": {"email": {
+                "enabled": False, "smtp_host": "localhost", "smtp_port": 25,
+                "ssl": False, "starttls": False, "username": "", "password": "",
+                "from": "property-monitor@localhost", "to": [],
+                "digest": "immediate", "max_items": 200, "poll_seconds": 30,
+                "backoff_max": 3600, "max_failures": 8
+            }}
         }
     
     def setup_data_storage(self):
@@ -62,102 +236,987 @@ class PropertyMonitor:
         self.properties_file = "data/tracked_properties.json"
         self.changes_file = "data/detected_changes.json"
         
-        self.tracked_properties = self.load_json(self.properties_file, [])
-        self.detected_changes = self.load_json(self.changes_file, [])
+        self.store = PropertyStore(self.config.get('storage', {}).get('db_file', 'data/property_monitor.db'))
+        self.store.migrate_json(self.properties_file, self.changes_file, "data/snapshots")
+        # Serialises cache reloads and write-through between request and check threads
+        self.state_lock = threading.RLock()
+        self.load_state()
     
-    def load_json(self, filepath, default):
-        try:
-            with open(filepath, 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return default
+    def load_state(self):
+        """(Re)load the in-memory cache of tracked entries and recent changes."""
+        with self.state_lock:
+            self.state_mtime = self.store.mtime()
+            self.state_revision, self.state_modified = self.store.revision()
+            self.tracked_properties = self.store.load_tracked()
+            self.recent_changes = self.store.load_changes(RECENT_CHANGES)
+            self.changes_total = self.store.count_changes()
+    
+    def refresh_if_stale(self):
+        """Reload the cache if another process wrote to the store.
+        
+        Costs a stat() when nothing changed; the revision is only read
+        when the database files have been modified.
+        """
+        mtime = self.store.mtime()
+        if mtime == self.state_mtime:
+            return False
+        with self.state_lock:
+            self.state_mtime = mtime
+            revision, _ = self.store.revision()
+            if revision == self.state_revision:
+                return False
+            logger.info("Store changed on disk, syncing state")
+            self._sync()
+            return True
+    
+    def _sync(self):
+        """Fold entries and changes written since our revision into the cache.
+        
+        Only rows stamped with a newer revision are read, so a shard or
+        another worker's write costs what it touched rather than a full
+        reload.
+        """
+        with self.state_lock:
+            self.state_mtime = self.store.mtime()
+            revision, modified = self.store.revision()
+            updated = self.store.load_tracked(since_revision=self.state_revision)
+            new_changes = self.store.load_changes(RECENT_CHANGES, after_id=self.last_change_id())
+            if updated:
+                by_id = {entry['id']: entry for entry in updated}
+                tracked = [by_id.pop(p['id'], p) for p in self.tracked_properties]
+                self.tracked_properties = tracked + list(by_id.values())
+            if new_changes:
+                self.recent_changes = (self.recent_changes + new_changes)[-RECENT_CHANGES:]
+                self.changes_total = self.store.count_changes()
+            self.state_revision, self.state_modified = revision, modified
+    
+    def _after_write(self, new_changes=()):
+        """Write-through: fold our own write into the cache.
+        
+        Every store write bumps the revision by one, so any larger jump
+        means another process wrote too and the cache is synced.
+        """
+        with self.state_lock:
+            revision, modified = self.store.revision()
+            if revision != self.state_revision + 1:
+                self._sync()
+                return
+            self.state_revision, self.state_modified = revision, modified
+            self.state_mtime = self.store.mtime()
+            if new_changes:
+                self.recent_changes = (self.recent_changes + list(new_changes))[-RECENT_CHANGES:]
+                self.changes_total += len(new_changes)
+    
+    def _track(self, entries):
+        # A new list rather than extend(), so a check iterating the old one is unaffected
+        with self.state_lock:
+            self.tracked_properties = self.tracked_properties + list(entries)
+    
+    def query_properties(self, zip_code=None, owner=None, limit=None, offset=0):
+        """Filtered page of tracked entries, served from memory."""
+        matches = self.tracked_properties
+        if zip_code:
+            matches = [
+                p for p in matches
+                if (p['search_type'] == 'zip' and p['search_value'] == zip_code)
+                or zip_code in str(p.get('current_data', {}).get('OWNER_CITY_STATE_ZIP', ''))
+            ]
+        if owner:
+            owner = owner.lower()
+            matches = [p for p in matches if owner in str(p.get('current_data', {}).get('OWNER', '')).lower()]
+        end = None if limit is None else offset + limit
+        return matches[offset:end], len(matches)
+    
+    def query_changes(self, since=None, zip_code=None, field=None, limit=None, offset=0):
+        """Page of change records; unfiltered recent pages come from memory."""
+        filtered = bool(since or zip_code or field)
+        in_memory = len(self.recent_changes) == self.changes_total
+        if not in_memory and not filtered:
+            in_memory = limit is not None and offset + limit <= len(self.recent_changes)
+        if not in_memory:
+            return self.store.query_changes(since, zip_code, field, limit, offset)
+        
+        matches = self.recent_changes
+        if since:
+            matches = [c for c in matches if c['detected_date'] > since]
+        if zip_code:
+            matches = [c for c in matches if c.get('zip_code') == zip_code or c.get('property_id') == f"zip_{zip_code}"]
+        if field:
+            matches = [c for c in matches if any(f['field'] == field for f in c['changes'])]
+        end = len(matches) - offset
+        start = 0 if limit is None else max(0, end - limit)
+        return matches[start:max(0, end)], len(matches) if filtered else self.changes_total
+    
+    def last_change_id(self):
+        return self.recent_changes[-1]['id'] if self.recent_changes else 0
     
-    def save_json(self, filepath, data):
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
+    def changes_after(self, change_id, limit=50):
+        """The newest `limit` change records with id > change_id, oldest first."""
+        return [c for c in self.recent_changes if c['id'] > change_id][-limit:]
+    
+    def collect_metrics(self):
+        """Refresh the gauges read from state rather than updated as things happen."""
+        TRACKED.set(len(self.tracked_properties))
+        if self.cache:
+            for stat, value in self.cache.stats().items():
+                CACHE.set(value, stat=stat)
+    
+    def property_history(self, key, since=None, until=None, field=None, limit=None, offset=0):
+        """Change history of one parcel or watch (see PropertyStore.history_key).
+        
+        Detailed records come newest first; with a field filter each record
+        only lists that field. Months already compacted are returned as
+        rollups alongside.
+        """
+        changes, total = self.store.change_history(key, since, until, field, limit, offset)
+        if field:
+            for change in changes:
+                change['changes'] = [c for c in change['changes'] if c['field'] == field]
+        return {
+            'changes': changes,
+            'total': total,
+            'rollups': self.store.change_rollups(key, since, until, field)
+        }
+    
+    def compact_history(self, retention_days=None):
+        """Roll change records older than the retention period up by month.
+        
+        The cutoff is rounded down to the start of a month so a month is
+        never split between detail and rollup.
+        """
+        if retention_days is None:
+            retention_days = self.config.get('history', {}).get('retention_days', 365)
+        if not retention_days:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=retention_days)).strftime('%Y-%m-01')
+        compacted, rollups = self.store.compact_changes(cutoff)
+        if compacted:
+            logger.info(f"Compacted {compacted} change records before {cutoff} into {rollups} monthly rollups")
+            self.load_state()
+        return compacted
     
     def add_property(self, search_value, search_type='address', alert_email=None):
         logger.info(f"Adding: {search_value} ({search_type})")
+        if search_type == 'zip' and not ZIP_CODE.fullmatch(search_value):
+            logger.warning(f"{search_value} is not a 5-digit ZIP code")
+            return False
+        
+        try:
+            if search_type == 'zip':
+                found = self.fetch_properties_by_zip(search_value, 1)
+            else:
+                found = self.fetch_property_data(search_value, search_type)
+        except CountyAPIError as e:
+            logger.error(f"Could not validate {search_value}: {e}")
+            return False
+        if not found:
+            logger.warning(f"No parcel matches {search_value}")
+            return False
         
+        entry = self.new_entry(search_value, search_type, found)
+        if alert_email:
+            entry['alert_email'] = alert_email
+        if not self.store.insert_tracked(entry):
+            logger.warning(f"{search_value} is already tracked as {entry['id']}")
+            return False
+        
+        self._track([entry])
+        self._after_write()
+        logger.info(f"✓ Added: {entry['id']}")
+        return True
+    
+    def new_entry(self, search_value, search_type, found=None):
+        """Watchlist entry for a ZIP, or for a parcel from its attributes."""
         if search_type == 'zip':
-            test = self.fetch_properties_by_zip(search_value, 1)
-            if not test:
-                return False
-            
-            entry = {
+            return {
                 'id': f"zip_{search_value}",
                 'search_value': search_value,
                 'search_type': 'zip',
                 'added_date': datetime.now().isoformat(),
                 'status': 'active'
             }
-        else:
-            data = self.fetch_property_data(search_value, search_type)
-            if not data:
-                return False
-            
-            entry = {
-                'id': f"prop_{data.get('ASSESSMENT_NUM')}",
-                'search_value': search_value,
-                'search_type': search_type,
-                'added_date': datetime.now().isoformat(),
-                'current_data': data,
-                'status': 'active'
-            }
+        entry = {
+            'id': f"prop_{found.get('ASSESSMENT_NUM')}",
+            'search_value': search_value,
+            'search_type': search_type,
+            'added_date': datetime.now().isoformat(),
+            'status': 'active'
+        }
+        data = project(found, self.watch_fields(entry))
+        entry['current_data'] = data
+        self.update_hashes(entry, data)
+        return entry
+    
+    def import_properties(self, rows, default_type='address'):
+        """Add many watchlist entries with batched validation and one write.
         
-        self.tracked_properties.append(entry)
-        self.save_json(self.properties_file, self.tracked_properties)
-        logger.info(f"✓ Added: {entry['id']}")
-        return True
+        rows are (search_value, search_type) pairs or bare values of
+        default_type, e.g. from read_watchlist(). Addresses are resolved
+        from the parcel index, then by batch geocoding, then by address
+        query; parcels are validated with batched IN lookups and ZIPs with
+        one query each. Repeats within the import and entries already
+        tracked are skipped via a set of tracked ids.
+        
+        Returns {'rows', 'added', 'duplicates', 'failures'}, the last two
+        listing {'row', 'value', 'type', 'reason'|'error'} (rows count from 1).
+        """
+        pending, duplicates, failures = [], [], []
+        seen = set()
+        rows_total = 0
+        for row, item in enumerate(rows, 1):
+            rows_total = row
+            value, search_type = item if isinstance(item, (list, tuple)) else (item, default_type)
+            value = str(value or '').strip()
+            search_type = IMPORT_TYPES.get(str(search_type or default_type).strip().lower())
+            if not value or search_type is None:
+                failures.append({'row': row, 'value': value, 'type': search_type, 'error': 'invalid row'})
+                continue
+            if search_type == 'zip' and not ZIP_CODE.fullmatch(value):
+                failures.append({'row': row, 'value': value, 'type': search_type, 'error': 'invalid ZIP code'})
+                continue
+            key = (search_type, ' '.join(value.upper().split()))
+            if key in seen:
+                duplicates.append({'row': row, 'value': value, 'type': search_type, 'reason': 'repeated in import'})
+                continue
+            seen.add(key)
+            pending.append((row, value, search_type))
+        
+        numbers, errors = self._resolve_import(pending)
+        found, failed = self.fetch_properties_by_assessment(set(numbers.values()), out_fields=self.out_fields())
+        
+        def validate_zip(zip_code):
+            return self.fetch_properties_by_zip(zip_code, 1)
+        
+        zips = [value for _, value, search_type in pending if search_type == 'zip']
+        zip_results = {zip_code: (result, error) for zip_code, result, error in self.fetcher.map(validate_zip, zips)}
+        
+        tracked = {p['id'] for p in self.tracked_properties}
+        entries = []
+        for row, value, search_type in pending:
+            if search_type == 'zip':
+                result, error = zip_results[value]
+            else:
+                number = numbers.get(row)
+                result = found.get(number)
+                error = errors.get(row) or failed.get(number)
+            if error or not result:
+                failures.append({
+                    'row': row, 'value': value, 'type': search_type,
+                    'error': str(error) if error else 'not found'
+                })
+                continue
+            entry = self.new_entry(value, search_type, result)
+            if entry['id'] in tracked:
+                duplicates.append({
+                    'row': row, 'value': value, 'type': search_type,
+                    'reason': f"already tracked as {entry['id']}"
+                })
+                continue
+            tracked.add(entry['id'])
+            entries.append(entry)
+        
+        if entries:
+            self.store.upsert_tracked(entries)
+            self._track(entries)
+            self._after_write()
+        failures.sort(key=lambda failure: failure['row'])
+        duplicates.sort(key=lambda duplicate: duplicate['row'])
+        logger.info(
+            f"Imported {len(entries)} of {rows_total} rows: {len(duplicates)} duplicates, {len(failures)} failed"
+        )
+        return {'rows': rows_total, 'added': len(entries), 'duplicates': duplicates, 'failures': failures}
+    
+    def _resolve_import(self, pending):
+        """ASSESSMENT_NUM for each parcel row: ({row: number}, {row: error})."""
+        numbers, errors = {}, {}
+        addresses = []
+        for row, value, search_type in pending:
+            if search_type == 'assessment':
+                numbers[row] = value
+            elif search_type == 'address':
+                assessment_num = self.index.resolve(value) if self.index else None
+                if assessment_num:
+                    numbers[row] = assessment_num
+                else:
+                    addresses.append((row, value))
+        
+        unresolved = []
+        if addresses:
+            geocoded = self.scraper.get_parcels_by_addresses(value for _, value in addresses)
+            for (row, value), (_, attributes) in zip(addresses, geocoded):
+                if attributes and attributes.get('ASSESSMENT_NUM'):
+                    numbers[row] = str(attributes['ASSESSMENT_NUM'])
+                else:
+                    unresolved.append((row, value))
+        
+        # What the locator can't place may still match an address query, as add_property does
+        def query(item):
+            return self.fetch_property_data(item[1], 'address', 'ASSESSMENT_NUM')
+        
+        for (row, _), attributes, error in self.fetcher.map(query, unresolved):
+            if error:
+                errors[row] = error
+            elif attributes:
+                numbers[row] = str(attributes.get('ASSESSMENT_NUM'))
+        
+        logger.info(
+            f"Import: {len(numbers)} parcel rows resolved, {len(addresses)} geocoded, "
+            f"{len(unresolved)} by address query"
+        )
+        return numbers, errors
     
     def fetch_properties_by_zip(self, zip_code, limit=100):
+        """First `limit` parcels for a ZIP, or None if there are none.
+        
+        Raises CountyAPIError if the county API fails.
+        """
         url = f"{self.parcels_url}/query"
         params = {
-            'where': f"OWNER_CITY_STATE_ZIP LIKE '%{zip_code}%'",
-            'outFields': '*',
+            'where': f"OWNER_CITY_STATE_ZIP LIKE {quote(f'%{zip_code}%')}",
+            'outFields': self.out_fields(),
+            'returnGeometry': 'false',
             'resultRecordCount': limit,
             'f': 'json'
         }
         
-        try:
-            r = requests.get(url, params=params, timeout=30)
-            data = r.json()
-            if data.get('features'):
-                return [f['attributes'] for f in data['features']]
-        except:
-            pass
+        data = self.fetcher.get_json(url, params)
+        if data.get('features'):
+            return [f['attributes'] for f in data['features']]
         return None
     
-    def fetch_property_data(self, search_value, search_type):
+    def iter_properties_by_zip(self, zip_code, page_size=1000, edited_since=None, out_fields=None):
+        """Yield every parcel for a ZIP, or only those matching an edited_since clause."""
+        where = f"OWNER_CITY_STATE_ZIP LIKE {quote(f'%{zip_code}%')}"
+        if edited_since:
+            where += f" AND {edited_since}"
+        return self.iter_where(where, page_size, out_fields)
+    
+    def iter_where(self, where, page_size=1000, out_fields=None):
+        """Yield every parcel matching a where clause, paging with resultOffset.
+        
+        out_fields defaults to the configured monitoring fields. Pages are
+        always revalidated, never served from the response cache.
+        """
+        out_fields = out_fields or self.out_fields()
+        url = f"{self.parcels_url}/query"
+        offset = 0
+        while True:
+            params = {
+                'where': where,
+                'outFields': out_fields,
+                'returnGeometry': 'false',
+                'orderByFields': 'OBJECTID',
+                'resultOffset': offset,
+                'resultRecordCount': page_size,
+                'f': 'json'
+            }
+            data = self.fetcher.get_json(url, params, revalidate=True)
+            features = data.get('features', [])
+            for feature in features:
+                yield feature['attributes']
+            
+            offset += len(features)
+            if not features or not data.get('exceededTransferLimit', len(features) == page_size):
+                break
+    
+    def query_ids(self, where):
+        """OBJECTIDs matching a where clause; returnIdsOnly isn't paged."""
+        data = self.fetcher.get_json(f"{self.parcels_url}/query", {
+            'where': where,
+            'returnIdsOnly': 'true',
+            'f': 'json'
+        }, revalidate=True)
+        return data.get('objectIds') or []
+    
+    def count_where(self, where):
+        data = self.fetcher.get_json(f"{self.parcels_url}/query", {
+            'where': where,
+            'returnCountOnly': 'true',
+            'f': 'json'
+        }, revalidate=True)
+        return data.get('count', 0)
+    
+    def fetch_by_object_ids(self, object_ids, chunk_size=500, out_fields=None):
+        """Yield the parcels with the given OBJECTIDs."""
+        out_fields = out_fields or self.out_fields()
+        object_ids = sorted(object_ids)
+        for start in range(0, len(object_ids), chunk_size):
+            chunk = object_ids[start:start + chunk_size]
+            data = self._query({
+                'objectIds': ','.join(str(i) for i in chunk),
+                'outFields': out_fields,
+                'returnGeometry': 'false',
+                'f': 'json'
+            }, revalidate=True)
+            for feature in data.get('features', []):
+                yield feature['attributes']
+    
+    def _query(self, params, revalidate=False):
+        """Run a layer query, POSTing it when the GET URL would be too long."""
         url = f"{self.parcels_url}/query"
+        if len(url) + len(urlencode(params)) + 1 > MAX_GET_URL_LENGTH:
+            return self.fetcher.get_json(url, data=params, revalidate=revalidate)
+        return self.fetcher.get_json(url, params, revalidate=revalidate)
+    
+    # Layer metadata and field projection
+    
+    def layer_info(self):
+        """Tax_Parcel layer metadata; {} while unavailable (retried every 5 minutes)."""
+        if self.layer is None and time.time() >= self.layer_retry_at:
+            try:
+                self.layer = self.fetcher.get_json(self.parcels_url, {'f': 'json'})
+            except CountyAPIError as e:
+                logger.warning(f"Layer info unavailable ({e}); fetching in full")
+                self.layer_retry_at = time.time() + 300
+        return self.layer or {}
+    
+    def object_id_field(self):
+        return self.layer_info().get('objectIdField', 'OBJECTID')
+    
+    def watch_fields(self, prop=None):
+        """Fields fetched, stored and diffed for a watch, or None for all.
+        
+        monitoring.watch_fields[<watch id>] overrides monitoring.fields.
+        The key, address, OBJECTID and edit-date fields are always kept,
+        and names the layer doesn't have are dropped with a warning.
+        """
+        monitoring = self.config.get('monitoring', {})
+        fields = monitoring.get('watch_fields', {}).get(prop['id']) if prop else None
+        fields = fields or monitoring.get('fields')
+        if not fields:
+            return None
+        
+        required = ['ASSESSMENT_NUM', 'PHYSICAL_ADDRESS', self.object_id_field()]
+        edit_field = self.edit_date_field()
+        if edit_field:
+            required.append(edit_field)
+        fields = list(dict.fromkeys(required + list(fields)))
+        
+        known = {f.get('name') for f in self.layer_info().get('fields') or []}
+        if known:
+            unknown = [f for f in fields if f not in known]
+            for field in set(unknown) - self.unknown_fields:
+                logger.warning(f"Field {field} is not on the parcel layer; ignoring it")
+            self.unknown_fields.update(unknown)
+            fields = [f for f in fields if f in known]
+        return fields
+    
+    def bookkeeping_fields(self):
+        """OBJECTID and edit-date fields: fetched for delta checks, never diffed."""
+        layer = self.layer_info()
+        fields = {self.object_id_field()}
+        edit_field = (layer.get('editFieldsInfo') or {}).get('editDateField')
+        if edit_field:
+            fields.add(edit_field)
+        return fields
+    
+    def out_fields(self, *props):
+        """outFields covering the given watches (default: the configured fields)."""
+        combined = {}
+        for prop in props or (None,):
+            fields = self.watch_fields(prop)
+            if fields is None:
+                return '*'
+            combined.update(dict.fromkeys(fields))
+        return ','.join(combined)
+    
+    # Incremental (delta) fetching
+    
+    def edit_date_field(self):
+        """The layer's edit-tracking date field, or None to fetch in full."""
+        if not self.config.get('delta', {}).get('enabled', True):
+            return None
+        return (self.layer_info().get('editFieldsInfo') or {}).get('editDateField')
+    
+    def edited_since(self, edit_field, watermark):
+        """where clause for parcels edited after a watermark (epoch ms), less some overlap."""
+        overlap = self.config.get('delta', {}).get('overlap_seconds', 300) * 1000
+        since = datetime.fromtimestamp(max(0, watermark - overlap) / 1000, timezone.utc)
+        return f"{edit_field} > timestamp '{since:%Y-%m-%d %H:%M:%S}'"
+    
+    def delta_allowed(self, prop, checked_at):
+        """Whether a watch has a watermark and a recent enough full check."""
+        if prop.get('watermark') is None or not prop.get('last_full_check'):
+            return False
+        hours = self.config.get('delta', {}).get('full_every_hours', 168)
+        age = datetime.fromisoformat(checked_at) - datetime.fromisoformat(prop['last_full_check'])
+        return age < timedelta(hours=hours)
+    
+    def fetch_edited_assessments(self, assessment_nums, edit_field, watermark, out_fields=None):
+        """fetch_properties_by_assessment() limited to parcels edited since watermark.
+        
+        A returnCountOnly query sizes the parish-wide edits first. When
+        paging through all of them takes fewer requests than the batched
+        IN (...) lookups, the watched parcels are picked out of that;
+        otherwise the IN queries carry the edit-date clause. Numbers in
+        neither result dict were not edited.
+        """
+        clause = self.edited_since(edit_field, watermark)
+        wanted = {str(n) for n in assessment_nums}
+        chunk_size = self.config.get('fetch', {}).get('batch_size', 500)
+        page_size = 1000
+        edited = self.count_where(clause)
+        if edited / page_size > len(wanted) / chunk_size:
+            return self.fetch_properties_by_assessment(
+                wanted, edited_since=clause, out_fields=out_fields, revalidate=True
+            )
+        
+        found = {}
+        for attributes in self.iter_where(clause, page_size, out_fields):
+            assessment_num = str(attributes.get('ASSESSMENT_NUM'))
+            if assessment_num in wanted:
+                found[assessment_num] = attributes
+        logger.info(f"Incremental check: {edited} parcels edited parish-wide, {len(found)} watched")
+        return found, {}
+    
+    def fetch_property_data(self, search_value, search_type, out_fields=None, revalidate=False):
+        """First parcel matching an address or assessment number, or None.
+        
+        An address the local parcel index matches exactly is fetched by its
+        ASSESSMENT_NUM; anything else goes to the county as a LIKE query.
+        The index only resolves the number, the record is always live.
+        Raises CountyAPIError if the county API fails.
+        """
+        url = f"{self.parcels_url}/query"
+        
+        if search_type == 'address' and self.index:
+            assessment_num = self.index.resolve(search_value)
+            if assessment_num:
+                logger.info(f"Resolved {search_value} locally: {assessment_num}")
+                search_value, search_type = assessment_num, 'assessment'
         
         if search_type == 'address':
-            where = f"PHYSICAL_ADDRESS LIKE '%{search_value}%'"
+            where = f"PHYSICAL_ADDRESS LIKE {quote(f'%{search_value}%')}"
         else:
-            where = f"ASSESSMENT_NUM = '{search_value}'"
+            where = f"ASSESSMENT_NUM = {quote(search_value)}"
         
-        params = {'where': where, 'outFields': '*', 'f': 'json', 'resultRecordCount': 1}
+        params = {
+            'where': where,
+            'outFields': out_fields or self.out_fields(),
+            'returnGeometry': 'false',
+            'resultRecordCount': 1,
+            'f': 'json'
+        }
         
-        try:
-            r = requests.get(url, params=params, timeout=30)
-            data = r.json()
-            if data.get('features'):
-                return data['features'][0]['attributes']
-        except:
-            pass
+        data = self.fetcher.get_json(url, params, revalidate=revalidate)
+        if data.get('features'):
+            return data['features'][0]['attributes']
         return None
     
-    def check_all_properties(self):
+    def fetch_properties_by_assessment(self, assessment_nums, chunk_size=None, edited_since=None, out_fields=None,
+                                       revalidate=False):
+        """Look up many assessment numbers with batched IN (...) queries.
+        
+        Returns (found, failed): a dict of ASSESSMENT_NUM -> attributes and
+        a dict of ASSESSMENT_NUM -> error for numbers whose chunk failed.
+        Numbers in neither were not found on the server (or, with an
+        edited_since clause, not edited). Checks pass revalidate so the
+        response cache never hides a change.
+        """
+        if chunk_size is None:
+            chunk_size = self.config.get('fetch', {}).get('batch_size', 500)
+        
+        unique = list(dict.fromkeys(str(n) for n in assessment_nums))
+        chunks = [unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)]
+        
+        results = {}
+        failed = {}
+        out_fields = out_fields or self.out_fields()
+        
+        def query(chunk):
+            return self._query_assessment_chunk(chunk, out_fields, edited_since, revalidate)
+        
+        for chunk, features, error in self.fetcher.map(query, chunks):
+            if error:
+                logger.warning(f"Batch of {len(chunk)} assessments failed: {error}")
+                failed.update(dict.fromkeys(chunk, error))
+                continue
+            for attributes in features:
+                results[str(attributes.get('ASSESSMENT_NUM'))] = attributes
+        
+        logger.info(
+            f"Batch lookup: {len(results)}/{len(unique)} found, {len(failed)} failed "
+            f"in {len(chunks)} requests"
+        )
+        return results, failed
+    
+    def _query_assessment_chunk(self, chunk, out_fields, edited_since=None, revalidate=False):
+        quoted = ", ".join(quote(n) for n in chunk)
+        where = f"ASSESSMENT_NUM IN ({quoted})"
+        if edited_since:
+            where += f" AND {edited_since}"
+        data = self._query({
+            'where': where,
+            'outFields': out_fields,
+            'returnGeometry': 'false',
+            'resultRecordCount': len(chunk),
+            'f': 'json'
+        }, revalidate)
+        return [f['attributes'] for f in data.get('features', [])]
+    
+    def refresh_property(self, prop):
+        """Re-fetch a tracked property, by assessment number when known."""
+        assessment_num = prop.get('current_data', {}).get('ASSESSMENT_NUM')
+        out_fields = self.out_fields(prop)
+        if assessment_num:
+            return self.fetch_property_data(assessment_num, 'assessment', out_fields, revalidate=True)
+        return self.fetch_property_data(prop['search_value'], prop['search_type'], out_fields, revalidate=True)
+    
+    def watched_hashes(self, data):
+        """Per-field digests of everything but the bookkeeping fields."""
+        bookkeeping = self.bookkeeping_fields()
+        return hash_fields({f: v for f, v in data.items() if f not in bookkeeping})
+    
+    def update_hashes(self, prop, data):
+        field_hashes = self.watched_hashes(data)
+        prop['field_hashes'] = field_hashes
+        prop['content_hash'] = hash_value(field_hashes)
+    
+    def detect_changes(self, prop, data, detected_date):
+        """Compare fresh attributes against the stored snapshot.
+        
+        Returns a change record in the detected changes format, or None
+        when the content hash is unchanged (or this is the first snapshot).
+        Fields only one side has (the field projection or the layer schema
+        changed) are not reported, and bookkeeping fields are ignored.
+        """
+        field_hashes = self.watched_hashes(data)
+        content_hash = hash_value(field_hashes)
+        if prop.get('content_hash') == content_hash:
+            return None
+        
+        old_data = prop.get('current_data', {})
+        old_hashes = prop.get('field_hashes')
+        prop['current_data'] = data
+        prop['field_hashes'] = field_hashes
+        prop['content_hash'] = content_hash
+        if old_hashes is None:
+            return None
+        fields = [f for f in diff_fields(old_hashes, field_hashes) if f in old_hashes and f in field_hashes]
+        if not fields:
+            return None
+        
+        return {
+            'property_id': prop['id'],
+            'assessment_num': data.get('ASSESSMENT_NUM'),
+            'property_address': data.get('PHYSICAL_ADDRESS') or prop['search_value'],
+            'detected_date': detected_date,
+            'changes': [
+                {'field': field, 'old_value': old_data.get(field), 'new_value': data.get(field)}
+                for field in fields
+            ]
+        }
+    
+    def check_zip(self, prop, detected_date, staged):
+        """Diff a ZIP watch against its previous snapshot.
+        
+        Parcels stream into a columnar snapshot (snapshot_store.py), which
+        is then diffed against the previous one column by column
+        (snapshot_diff.py). When the layer tracks edit dates, only parcels
+        edited since the watch's watermark are downloaded (see _zip_delta),
+        with a full harvest every delta.full_every_hours. Watches whose only
+        baseline is a digest snapshot from before the columnar format are
+        compared against that once, without old values.
+        
+        The new snapshot is only staged; its (watch id, path) is appended
+        to staged for the caller to commit once the change records are
+        stored, so a failed write leaves the old baseline in place.
+        """
+        zip_code = prop['search_value']
+        edit_field = self.edit_date_field()
+        fields = self.watch_fields(prop)
+        out_fields = ','.join(fields) if fields else '*'
+        previous = self.snapshots.open(prop['id'])
+        with previous or nullcontext():
+            incremental = (
+                previous is not None and edit_field is not None
+                and self.delta_allowed(prop, detected_date)
+                and self.object_id_field() in previous.fields
+            )
+            if incremental:
+                try:
+                    parcels = self._zip_delta(zip_code, previous, edit_field, prop['watermark'], out_fields)
+                except CountyAPIError as e:
+                    logger.warning(f"ZIP {zip_code}: incremental pull failed ({e}); harvesting in full")
+                    incremental = False
+            if not incremental:
+                parcels = (
+                    (attributes, True)
+                    for attributes in self.iter_properties_by_zip(zip_code, out_fields=out_fields)
+                )
+            
+            writer = SnapshotWriter()
+            harvested = []
+            with STAGE_SECONDS.time(stage='fetch', kind='zip'):
+                for attributes, fetched in parcels:
+                    writer.add(project(attributes, fields))
+                    if self.index and fetched:
+                        harvested.append(attributes)
+                        if len(harvested) >= 1000:
+                            self.index.add_parcels(harvested)
+                            harvested = []
+                if harvested:
+                    self.index.add_parcels(harvested)
+            
+            legacy = self.store.load_snapshot(prop['id']) if previous is None else None
+            with STAGE_SECONDS.time(stage='persist', kind='zip'):
+                path = self.snapshots.stage(prop['id'], writer, detected_date)
+            del writer
+            
+            changes = []
+            try:
+                with Snapshot(path) as current, STAGE_SECONDS.time(stage='diff', kind='zip'):
+                    if previous:
+                        # Fields only one side has mean the projection changed, not the parcels
+                        common = set(previous.fields) & set(current.fields) - self.bookkeeping_fields()
+                        diffs = diff_snapshots(previous, current, common)
+                        changes = [self._zip_change(prop, detected_date, diff, previous, current) for diff in diffs]
+                    elif legacy:
+                        diffs = self._diff_digest_snapshot(legacy, current)
+                        changes = [self._zip_change(prop, detected_date, diff, None, current) for diff in diffs]
+                    parcel_count = len(current)
+                    if edit_field and edit_field in current.fields:
+                        prop['watermark'] = high_water(current.values(edit_field), prop.get('watermark'))
+            except Exception:
+                self.snapshots.discard(path)
+                raise
+            staged.append((prop['id'], path))
+        
+        if not incremental:
+            prop['last_full_check'] = detected_date
+        prop['parcel_count'] = parcel_count
+        prop['last_checked'] = detected_date
+        logger.info(f"ZIP {zip_code}: {parcel_count} parcels, {len(changes)} changed")
+        return changes
+    
+    def _zip_delta(self, zip_code, previous, edit_field, watermark, out_fields):
+        """Rebuild a ZIP's parcels from its previous snapshot plus what changed.
+        
+        One returnIdsOnly query lists the ZIP's current OBJECTIDs and one
+        paged query returns the parcels edited since the watermark; parcels
+        new to the ZIP are then fetched by id and those gone are dropped.
+        Every request is made before this returns, so a CountyAPIError
+        comes from here rather than halfway through the iterator of
+        (attributes, fetched) pairs it returns.
+        """
+        oid_field = self.object_id_field()
+        current_ids = set(self.query_ids(f"OWNER_CITY_STATE_ZIP LIKE {quote(f'%{zip_code}%')}"))
+        clause = self.edited_since(edit_field, watermark)
+        edited = {
+            a.get(oid_field): a
+            for a in self.iter_properties_by_zip(zip_code, edited_since=clause, out_fields=out_fields)
+        }
+        previous_ids = set(previous.values(oid_field))
+        new_ids = current_ids - previous_ids - edited.keys()
+        added = list(self.fetch_by_object_ids(new_ids, out_fields=out_fields))
+        logger.info(
+            f"ZIP {zip_code}: incremental pull, {len(edited)} edited, {len(new_ids)} new, "
+            f"{len(previous_ids - current_ids - edited.keys())} gone"
+        )
+        return self._merge_delta(previous, oid_field, current_ids, previous_ids, edited, added)
+    
+    def _merge_delta(self, previous, oid_field, current_ids, previous_ids, edited, added):
+        for attributes in previous:
+            object_id = attributes.get(oid_field)
+            if object_id in edited:
+                yield edited[object_id], True
+            elif object_id in current_ids:
+                yield attributes, False
+        for object_id, attributes in edited.items():
+            if object_id not in previous_ids:
+                yield attributes, True
+        yield from ((attributes, True) for attributes in added)
+    
+    def _zip_change(self, prop, detected_date, diff, previous, current):
+        """Change record for one parcel of a ZIP diff."""
+        assessment_num = diff['assessment_num']
+        snapshot = previous if diff['status'] == 'removed' else current
+        row = snapshot.find(assessment_num) if snapshot else None
+        address = snapshot.value('PHYSICAL_ADDRESS', row) if row is not None else None
+        if diff['status'] == 'added':
+            field_changes = [{'field': 'PARCEL', 'old_value': 'not in ZIP', 'new_value': 'in ZIP'}]
+        elif diff['status'] == 'removed':
+            field_changes = [{'field': 'PARCEL', 'old_value': 'in ZIP', 'new_value': 'not in ZIP'}]
+        else:
+            field_changes = diff['changes']
+        return {
+            'property_id': prop['id'],
+            'assessment_num': assessment_num,
+            'zip_code': prop['search_value'],
+            'property_address': address or f"{assessment_num} (ZIP {prop['search_value']})",
+            'detected_date': detected_date,
+            'changes': field_changes
+        }
+    
+    def _diff_digest_snapshot(self, legacy, current):
+        """diff_snapshots()-style results against a pre-columnar digest snapshot."""
+        old_fields, old_parcels = legacy
+        diffs = []
+        for attributes in current:
+            assessment_num = attributes[current.key]
+            previous = old_parcels.pop(assessment_num, None)
+            digest = digest_fields(attributes, old_fields)
+            if previous is None:
+                diffs.append({'assessment_num': assessment_num, 'status': 'added', 'changes': []})
+            elif previous != digest:
+                diffs.append({'assessment_num': assessment_num, 'status': 'changed', 'changes': [
+                    {'field': field, 'old_value': None, 'new_value': attributes.get(field)}
+                    for field in diff_digests(previous, old_fields, digest, old_fields)
+                ]})
+        for assessment_num in old_parcels:
+            diffs.append({'assessment_num': assessment_num, 'status': 'removed', 'changes': []})
+        return diffs
+    
+    def check_all_properties(self, progress=None, entries=None):
+        """Check every tracked entry (or just `entries`) and record what changed.
+        
+        progress, if given, is called as progress(done, total, changes) as
+        entries complete. Only the checked entries are written back, so
+        scheduler workers checking other shards aren't overwritten.
+        """
+        entries = self.tracked_properties if entries is None else entries
         logger.info("Checking properties...")
+        started = time.perf_counter()
         
-        for prop in self.tracked_properties:
+        checked_at = datetime.now().isoformat()
+        changes = []
+        staged = []
+        by_assessment = {}
+        unkeyed = []
+        total = len(entries)
+        done = 0
+        for prop in entries:
             if prop['search_type'] == 'zip':
-                logger.info(f"ZIP {prop['search_value']}: Monitoring")
+                try:
+                    changes.extend(self.check_zip(prop, checked_at, staged))
+                    prop['last_check_status'] = 'ok'
+                    CHECKED.inc(outcome='ok')
+                except CountyAPIError as e:
+                    CHECKED.inc(outcome='error')
+                    prop['last_check_status'] = 'error'
+                    prop['last_error'] = str(e)
+                    logger.error(f"ZIP {prop['search_value']}: check failed: {e}")
+                done += 1
+                if progress:
+                    progress(done, total, len(changes))
+                continue
+            assessment_num = prop.get('current_data', {}).get('ASSESSMENT_NUM')
+            if assessment_num:
+                by_assessment.setdefault(str(assessment_num), []).append(prop)
             else:
-                logger.info(f"Property {prop['search_value']}: No changes")
+                unkeyed.append(prop)
+        
+        # Parcels with a watermark only need what was edited since
+        edit_field = self.edit_date_field() if by_assessment else None
+        incremental = {}
+        if edit_field:
+            incremental = {
+                num: props for num, props in by_assessment.items()
+                if all(self.delta_allowed(prop, checked_at) for prop in props)
+            }
+        full = [num for num in by_assessment if num not in incremental]
+        out_fields = self.out_fields(*(prop for props in by_assessment.values() for prop in props))
+        
+        stage_started = time.perf_counter()
+        fetched, failed = self.fetch_properties_by_assessment(full, out_fields=out_fields, revalidate=True)
+        unchanged = set()
+        watermark = None
+        if incremental:
+            watermark = min(prop['watermark'] for props in incremental.values() for prop in props)
+            try:
+                edited, edit_failed = self.fetch_edited_assessments(incremental, edit_field, watermark, out_fields)
+                unchanged = set(incremental) - edited.keys() - edit_failed.keys()
+            except CountyAPIError as e:
+                logger.warning(f"Incremental check failed ({e}); fetching {len(incremental)} parcels in full")
+                edited, edit_failed = self.fetch_properties_by_assessment(
+                    incremental, out_fields=out_fields, revalidate=True
+                )
+                full += list(incremental)
+            fetched.update(edited)
+            failed.update(edit_failed)
+        
+        results = [
+            (prop, UNCHANGED if num in unchanged else fetched.get(num), failed.get(num))
+            for num, props in by_assessment.items() for prop in props
+        ]
+        results += list(self.fetcher.map(self.refresh_property, unkeyed))
+        STAGE_SECONDS.observe(time.perf_counter() - stage_started, stage='fetch', kind='parcel')
         
-        self.save_json(self.properties_file, self.tracked_properties)
-        return []
+        stage_started = time.perf_counter()
+        outcomes = {'ok': 0, 'not_found': 0, 'error': 0}
+        for prop, data, error in results:
+            done += 1
+            if progress:
+                progress(done, total, len(changes))
+            prop['last_checked'] = checked_at
+            if error:
+                prop['last_check_status'] = 'error'
+                prop['last_error'] = str(error)
+                outcomes['error'] += 1
+                logger.debug(f"Property {prop['search_value']}: fetch failed: {error}")
+                continue
+            if data is UNCHANGED:
+                prop['last_check_status'] = 'ok'
+                prop.pop('last_error', None)
+                outcomes['ok'] += 1
+                continue
+            if not data:
+                prop['last_check_status'] = 'not_found'
+                outcomes['not_found'] += 1
+                logger.warning(f"Property {prop['search_value']}: not found on county server")
+                continue
+            prop['last_check_status'] = 'ok'
+            prop.pop('last_error', None)
+            outcomes['ok'] += 1
+            change = self.detect_changes(prop, project(data, self.watch_fields(prop)), checked_at)
+            if change:
+                changes.append(change)
+                logger.info(f"Property {prop['search_value']}: {len(change['changes'])} field(s) changed")
+        STAGE_SECONDS.observe(time.perf_counter() - stage_started, stage='diff', kind='parcel')
+        for outcome, count in outcomes.items():
+            CHECKED.inc(count, outcome=outcome)
+        
+        if edit_field:
+            watermark = high_water((data.get(edit_field) for data in fetched.values()), watermark)
+            full = set(full)
+            for num, props in by_assessment.items():
+                for prop in props:
+                    if prop.get('last_check_status') == 'ok' and watermark is not None:
+                        prop['watermark'] = watermark
+                        if num in full:
+                            prop['last_full_check'] = checked_at
+        
+        stage_started = time.perf_counter()
+        if changes:
+            recipients = self.alerts.recipients(changes, {p['id']: p.get('alert_email') for p in entries})
+            try:
+                self.store.append_changes(changes, recipients)
+            except Exception:
+                for _, path in staged:
+                    self.snapshots.discard(path)
+                raise
+            self._after_write(changes)
+            CHANGES.inc(len(changes))
+            if recipients:
+                self.alerts.notify()
+        # New ZIP baselines go live after their changes, before the watermarks that depend on them
+        for watch_id, path in staged:
+            self.snapshots.commit(watch_id, path)
+        self.store.upsert_tracked(entries)
+        # Merge back by id: a sync during the check may have swapped in
+        # copies the check never updated
+        self._sync()
+        STAGE_SECONDS.observe(time.perf_counter() - stage_started, stage='persist', kind='parcel')
+        
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Check complete: {len(changes)} change record(s); {outcomes['ok']} ok, "
+            f"{outcomes['not_found']} not found, {outcomes['error']} failed; "
+            f"{total} entries in {elapsed:.1f}s"
+        )
+        if progress:
+            progress(total, total, len(changes))
+        return changes
     
     def generate_report(self, changes):
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -187,21 +1246,57 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--add', type=str)
     parser.add_argument('--type', type=str, default='address')
+    parser.add_argument('--alert-email', type=str, help='with --add: send this entry\'s alerts here')
     parser.add_argument('--check', action='store_true')
+    parser.add_argument('--import', dest='import_file', type=str, help='bulk-add entries from a CSV (see read_watchlist)')
     parser.add_argument('--list', action='store_true')
+    parser.add_argument('--index-zip', type=str, help='harvest a ZIP into the local parcel index')
+    parser.add_argument('--cache-stats', action='store_true')
+    parser.add_argument('--clear-cache', action='store_true')
+    parser.add_argument('--compact', action='store_true', help='roll up change history past history.retention_days')
+    parser.add_argument('--metrics', action='store_true', help='print metrics (Prometheus text) on exit')
     
     args = parser.parse_args()
     monitor = PropertyMonitor()
     
     if args.add:
-        if monitor.add_property(args.add, args.type):
+        if monitor.add_property(args.add, args.type, args.alert_email):
             print(f"✓ Added: {args.add}")
     
+    elif args.import_file:
+        with open(args.import_file, 'r', newline='') as f:
+            report = monitor.import_properties(read_watchlist(f, args.type), args.type)
+        print(f"✓ Imported {report['added']} of {report['rows']} rows ({len(report['duplicates'])} duplicates)")
+        for failure in report['failures']:
+            print(f"  row {failure['row']}: {failure['value']}: {failure['error']}")
+    
     elif args.check:
-        monitor.check_all_properties()
+        from scheduler import ShardScheduler
+        ShardScheduler(monitor).run_all()
         print("✓ Check complete")
+        if monitor.alerts.drain():
+            print("✓ Alerts sent")
     
     elif args.list:
         print(f"\nTracking {len(monitor.tracked_properties)} items:\n")
         for i, p in enumerate(monitor.tracked_properties, 1):
             print(f"{i}. {p['search_value']} ({p['search_type']})")
+    
+    elif args.index_zip and monitor.index:
+        count = monitor.index.add_parcels(monitor.iter_properties_by_zip(args.index_zip))
+        print(f"✓ Indexed {count} parcels from ZIP {args.index_zip} ({monitor.index.count()} total)")
+    
+    elif args.compact:
+        print(f"✓ Compacted {monitor.compact_history()} change records")
+    
+    elif args.cache_stats and monitor.cache:
+        for key, value in monitor.cache.stats().items():
+            print(f"{key}: {value}")
+    
+    elif args.clear_cache and monitor.cache:
+        monitor.cache.clear()
+        print("✓ Response cache cleared")
+    
+    if args.metrics:
+        monitor.collect_metrics()
+        print(metrics.render(), end='')
@@ -0,0 +1,114 @@
+"""
+PARCEL INDEX
+Local address -> ASSESSMENT_NUM index built from harvested parcels so
+address lookups don't need a remote LIKE '%...%' scan
+"""
+
+import sqlite3
+import json
+import re
+import threading
+import logging
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+ABBREVIATIONS = {
+    'STREET': 'ST', 'ROAD': 'RD', 'AVENUE': 'AVE', 'DRIVE': 'DR', 'BOULEVARD': 'BLVD',
+    'HIGHWAY': 'HWY', 'LANE': 'LN', 'COURT': 'CT', 'PLACE': 'PL', 'PARKWAY': 'PKWY',
+    'CIRCLE': 'CIR', 'TERRACE': 'TER', 'EXPRESSWAY': 'EXPY', 'AV': 'AVE',
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parcels (
+    id INTEGER PRIMARY KEY,
+    assessment_num TEXT NOT NULL UNIQUE,
+    address TEXT,
+    normalized TEXT,
+    zip_code TEXT,
+    attributes TEXT NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS parcels_normalized ON parcels (normalized);
+"""
+
+# Older indexes kept an unused FTS5 table in sync on every write; drop it
+DROP_FTS = """
+DROP TRIGGER IF EXISTS parcels_ai;
+DROP TRIGGER IF EXISTS parcels_ad;
+DROP TRIGGER IF EXISTS parcels_au;
+DROP TABLE IF EXISTS parcels_fts;
+"""
+
+
+def normalize_address(address):
+    """Upper-case street line with punctuation dropped and suffixes abbreviated."""
+    street = str(address or '').split(',')[0].upper()
+    tokens = re.sub(r"[^A-Z0-9/ ]", ' ', street).split()
+    return ' '.join(ABBREVIATIONS.get(t, t) for t in tokens)
+
+
+class ParcelIndex:
+    def __init__(self, db_file='data/parcel_index.db'):
+        Path(db_file).parent.mkdir(parents=True, exist_ok=True)
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.executescript(DROP_FTS)
+    
+    def add_parcels(self, parcels, batch_size=1000):
+        """Upsert harvested parcel attributes; returns how many were indexed."""
+        now = datetime.now().isoformat()
+        count = 0
+        batch = []
+        for attributes in parcels:
+            assessment_num = attributes.get('ASSESSMENT_NUM')
+            if not assessment_num:
+                continue
+            address = attributes.get('PHYSICAL_ADDRESS')
+            batch.append((
+                str(assessment_num), address, normalize_address(address),
+                attributes.get('ZIP'), json.dumps(attributes), now
+            ))
+            if len(batch) >= batch_size:
+                count += self._write(batch)
+                batch = []
+        if batch:
+            count += self._write(batch)
+        return count
+    
+    def _write(self, rows):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO parcels (assessment_num, address, normalized, zip_code, attributes, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (assessment_num) DO UPDATE SET address = excluded.address, "
+                "normalized = excluded.normalized, zip_code = excluded.zip_code, "
+                "attributes = excluded.attributes, indexed_at = excluded.indexed_at",
+                rows
+            )
+        return len(rows)
+    
+    def resolve(self, address):
+        """ASSESSMENT_NUM of the one parcel whose normalized address matches exactly, or None.
+        
+        Fuzzy and ambiguous matches return None so callers fall back to the
+        county rather than guess.
+        """
+        normalized = normalize_address(address)
+        if not normalized:
+            return None
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT assessment_num FROM parcels WHERE normalized = ? LIMIT 2", (normalized,)
+            ).fetchall()
+        return rows[0][0] if len(rows) == 1 else None
+    
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM parcels").fetchone()[0]
@@ -0,0 +1,553 @@
+"""
+PROPERTY STORE
+SQLite (WAL) storage for tracked entries, ZIP snapshots and detected changes
+"""
+
+import sqlite3
+import json
+import os
+import threading
+import logging
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracked (
+    id TEXT PRIMARY KEY,
+    search_type TEXT NOT NULL,
+    search_value TEXT NOT NULL,
+    assessment_num TEXT,
+    status TEXT,
+    added_date TEXT,
+    entry TEXT NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tracked_assessment ON tracked (assessment_num);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    watch_id TEXT PRIMARY KEY,
+    taken TEXT,
+    fields TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot_parcels (
+    watch_id TEXT NOT NULL,
+    assessment_num TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (watch_id, assessment_num)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    property_id TEXT,
+    assessment_num TEXT,
+    zip_code TEXT,
+    property_address TEXT,
+    detected_date TEXT NOT NULL,
+    changes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_date ON changes (detected_date);
+CREATE INDEX IF NOT EXISTS changes_property ON changes (property_id, detected_date);
+CREATE INDEX IF NOT EXISTS changes_assessment ON changes (assessment_num, detected_date);
+
+-- Compacted history: one row per parcel, month and field
+CREATE TABLE IF NOT EXISTS change_rollups (
+    property_id TEXT NOT NULL,
+    assessment_num TEXT NOT NULL,
+    month TEXT NOT NULL,
+    field TEXT NOT NULL,
+    changes INTEGER NOT NULL,
+    first_date TEXT NOT NULL,
+    last_date TEXT NOT NULL,
+    first_value TEXT,
+    last_value TEXT,
+    PRIMARY KEY (property_id, assessment_num, month, field)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS change_rollups_assessment ON change_rollups (assessment_num, month);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipient TEXT NOT NULL,
+    change_id INTEGER NOT NULL,
+    queued REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_recipient ON outbox (recipient, id);
+CREATE TABLE IF NOT EXISTS alert_recipients (
+    recipient TEXT PRIMARY KEY,
+    last_sent REAL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    retry_at REAL
+);
+"""
+
+
+class PropertyStore:
+    def __init__(self, db_file='data/property_monitor.db'):
+        Path(db_file).parent.mkdir(parents=True, exist_ok=True)
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        # Scheduler workers share the file, so wait out their write locks
+        self.conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(tracked)")}
+        if 'revision' not in columns:
+            self.conn.execute("ALTER TABLE tracked ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tracked_revision ON tracked (revision)")
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+    
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+    
+    def mtime(self):
+        """Latest modification time of the database and its WAL, in ns."""
+        mtimes = [0]
+        for path in (self.db_file, f"{self.db_file}-wal"):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                pass
+        return max(mtimes)
+    
+    def revision(self):
+        """(revision counter, last-modified epoch) of tracked entries and changes."""
+        with self.lock:
+            rows = dict(self.conn.execute(
+                "SELECT key, value FROM meta WHERE key IN ('revision', 'modified')"
+            ).fetchall())
+        return int(rows.get('revision', 0)), float(rows.get('modified', 0))
+    
+    def _touch(self):
+        """Bump the revision and return it; call inside a write transaction."""
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('revision', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+        )
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('modified', ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (time.time(),)
+        )
+        return int(self.conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()['value'])
+    
+    # Tracked entries
+    
+    def load_tracked(self, since_revision=None):
+        """Tracked entries in insertion order; with since_revision, only
+        those written after that store revision."""
+        sql = "SELECT entry FROM tracked"
+        params = ()
+        if since_revision is not None:
+            sql += " WHERE revision > ?"
+            params = (since_revision,)
+        with self.lock:
+            rows = self.conn.execute(sql + " ORDER BY rowid", params).fetchall()
+        return [json.loads(row['entry']) for row in rows]
+    
+    def upsert_tracked(self, entries):
+        with self.lock, self.conn:
+            self._upsert_tracked(entries, self._touch())
+    
+    def insert_tracked(self, entry):
+        """Add one entry unless its id is already tracked; returns whether it was added."""
+        with self.lock, self.conn:
+            if self.conn.execute("SELECT 1 FROM tracked WHERE id = ?", (entry['id'],)).fetchone():
+                return False
+            self._upsert_tracked([entry], self._touch())
+        return True
+    
+    def _upsert_tracked(self, entries, revision):
+        # Caller holds the lock and the transaction; rows are stamped with
+        # the revision so other processes can pick up just what changed
+        rows = [
+            (
+                e['id'], e['search_type'], e['search_value'],
+                e.get('current_data', {}).get('ASSESSMENT_NUM'),
+                e.get('status'), e.get('added_date'), json.dumps(e), revision
+            )
+            for e in entries
+        ]
+        self.conn.executemany(
+            "INSERT INTO tracked (id, search_type, search_value, assessment_num, status, added_date, entry, revision) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET search_type = excluded.search_type, "
+            "search_value = excluded.search_value, assessment_num = excluded.assessment_num, "
+            "status = excluded.status, entry = excluded.entry, revision = excluded.revision",
+            rows
+        )
+    
+    # Detected changes
+    
+    def append_changes(self, records, recipients=None):
+        """Insert change records in one transaction, setting each record's id.
+        
+        recipients, if given, holds each record's alert addresses; their
+        outbox rows are written in the same transaction.
+        """
+        with self.lock, self.conn:
+            self._append_changes(records)
+            if recipients:
+                self._enqueue_alerts(
+                    (address, record['id'])
+                    for record, addresses in zip(records, recipients) for address in addresses
+                )
+            self._touch()
+    
+    def _append_changes(self, records):
+        for record in records:
+            cursor = self.conn.execute(
+                "INSERT INTO changes (property_id, assessment_num, zip_code, property_address, "
+                "detected_date, changes) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    record.get('property_id'), record.get('assessment_num'),
+                    record.get('zip_code'), record.get('property_address'),
+                    record['detected_date'], json.dumps(record['changes'])
+                )
+            )
+            record['id'] = cursor.lastrowid
+    
+    def load_changes(self, limit=None, after_id=None):
+        """Change records oldest first; with limit, only the most recent ones,
+        with after_id, only those appended since that record."""
+        sql = "SELECT * FROM changes"
+        params = ()
+        if after_id is not None:
+            sql += " WHERE id > ?"
+            params = (after_id,)
+        sql += " ORDER BY id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [self.change_from_row(row) for row in reversed(rows)]
+    
+    def query_changes(self, since=None, zip_code=None, field=None, limit=None, offset=0):
+        """Filtered page of change records plus the total matching.
+        
+        offset counts back from the newest record; the page itself is
+        returned oldest first, like load_changes.
+        """
+        clauses, params = [], []
+        if since:
+            clauses.append("detected_date > ?")
+            params.append(since)
+        if zip_code:
+            clauses.append("(zip_code = ? OR property_id = ?)")
+            params += [zip_code, f"zip_{zip_code}"]
+        if field:
+            clauses.append(
+                "EXISTS (SELECT 1 FROM json_each(changes.changes) "
+                "WHERE json_extract(value, '$.field') = ?)"
+            )
+            params.append(field)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        with self.lock:
+            total = self.conn.execute(f"SELECT COUNT(*) FROM changes {where}", params).fetchone()[0]
+            rows = self.conn.execute(
+                f"SELECT * FROM changes {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit, offset]
+            ).fetchall()
+        return [self.change_from_row(row) for row in reversed(rows)], total
+    
+    @staticmethod
+    def history_key(key):
+        """WHERE clause and params matching a watch id (prop_/zip_) or an ASSESSMENT_NUM."""
+        key = str(key)
+        if key.startswith('zip_'):
+            return "property_id = ?", [key]
+        assessment_num = key[len('prop_'):] if key.startswith('prop_') else key
+        return "(assessment_num = ? OR property_id = ?)", [assessment_num, f"prop_{assessment_num}"]
+    
+    def change_history(self, key, since=None, until=None, field=None, limit=None, offset=0):
+        """One parcel's (or ZIP watch's) change records, newest first, plus the total.
+        
+        since <= detected_date < until; served by the property/assessment
+        date indexes.
+        """
+        where, params = self.history_key(key)
+        clauses = [where]
+        if since:
+            clauses.append("detected_date >= ?")
+            params.append(since)
+        if until:
+            clauses.append("detected_date < ?")
+            params.append(until)
+        if field:
+            clauses.append(
+                "EXISTS (SELECT 1 FROM json_each(changes.changes) "
+                "WHERE json_extract(value, '$.field') = ?)"
+            )
+            params.append(field)
+        where = ' AND '.join(clauses)
+        
+        with self.lock:
+            total = self.conn.execute(f"SELECT COUNT(*) FROM changes WHERE {where}", params).fetchone()[0]
+            rows = self.conn.execute(
+                f"SELECT * FROM changes WHERE {where} ORDER BY detected_date DESC, id DESC LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit, offset]
+            ).fetchall()
+        return [self.change_from_row(row) for row in rows], total
+    
+    def change_rollups(self, key, since=None, until=None, field=None):
+        """Monthly rollups of compacted history for a key, newest month first.
+        
+        since and until select months the same way change_history() selects
+        records, until being exclusive.
+        """
+        where, params = self.history_key(key)
+        clauses = [where]
+        if since:
+            clauses.append("month >= ?")
+            params.append(since[:7])
+        if until:
+            # Exclusive like change_history(): until's own month only counts
+            # if a record detected in it could sort before until
+            clauses.append("month <= ?" if f"{until[:7]}-01T00:00:00" < until else "month < ?")
+            params.append(until[:7])
+        if field:
+            clauses.append("field = ?")
+            params.append(field)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM change_rollups WHERE {' AND '.join(clauses)} ORDER BY month DESC, field",
+                params
+            ).fetchall()
+        rollups = []
+        for row in rows:
+            rollup = dict(row)
+            rollup['first_value'] = json.loads(rollup['first_value'])
+            rollup['last_value'] = json.loads(rollup['last_value'])
+            rollups.append(rollup)
+        return rollups
+    
+    def compact_changes(self, before):
+        """Fold change records detected before `before` into monthly rollups.
+        
+        Runs in one transaction; returns (records compacted, rollup rows
+        written or updated).
+        """
+        rollups = {}
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT property_id, assessment_num, detected_date, changes FROM changes "
+                "WHERE detected_date < ? ORDER BY detected_date, id",
+                (before,)
+            )
+            compacted = 0
+            for row in rows:
+                compacted += 1
+                for change in json.loads(row['changes']):
+                    key = (
+                        row['property_id'] or '', row['assessment_num'] or '',
+                        row['detected_date'][:7], change['field']
+                    )
+                    rollup = rollups.get(key)
+                    if rollup is None:
+                        rollup = rollups[key] = {
+                            'changes': 0, 'first_date': row['detected_date'],
+                            'first_value': change.get('old_value')
+                        }
+                    rollup['changes'] += 1
+                    rollup['last_date'] = row['detected_date']
+                    rollup['last_value'] = change.get('new_value')
+            
+            self.conn.executemany(
+                "INSERT INTO change_rollups (property_id, assessment_num, month, field, changes, "
+                "first_date, last_date, first_value, last_value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (property_id, assessment_num, month, field) DO UPDATE SET "
+                "changes = changes + excluded.changes, "
+                "first_date = MIN(first_date, excluded.first_date), "
+                "first_value = CASE WHEN excluded.first_date < first_date THEN excluded.first_value ELSE first_value END, "
+                "last_value = CASE WHEN excluded.last_date >= last_date THEN excluded.last_value ELSE last_value END, "
+                "last_date = MAX(last_date, excluded.last_date)",
+                (
+                    key + (r['changes'], r['first_date'], r['last_date'],
+                           json.dumps(r['first_value']), json.dumps(r['last_value']))
+                    for key, r in rollups.items()
+                )
+            )
+            self.conn.execute("DELETE FROM changes WHERE detected_date < ?", (before,))
+            if compacted:
+                self._touch()
+        return compacted, len(rollups)
+    
+    def count_changes(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM changes").fetchone()[0]
+    
+    @staticmethod
+    def change_from_row(row):
+        record = {k: row[k] for k in row.keys() if row[k] is not None}
+        record['changes'] = json.loads(row['changes'])
+        return record
+    
+    # Scheduler leases
+    
+    def acquire_lease(self, name, owner, ttl):
+        """Take (or renew) a lease for ttl seconds; False while another owner holds it."""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.owner = excluded.owner OR leases.expires < ?",
+                (name, owner, now + ttl, now)
+            )
+            row = self.conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+        return row['owner'] == owner
+    
+    def release_lease(self, name, owner):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+    
+    # Alert outbox; not part of the dashboard state, so writes don't bump the revision
+    
+    def _enqueue_alerts(self, items):
+        now = time.time()
+        self.conn.executemany(
+            "INSERT INTO outbox (recipient, change_id, queued) VALUES (?, ?, ?)",
+            ((recipient, change_id, now) for recipient, change_id in items)
+        )
+    
+    def pending_recipients(self):
+        """Recipients with queued alerts: dicts of recipient, pending, oldest, last_sent, failures, retry_at."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT o.recipient, COUNT(*) AS pending, MIN(o.queued) AS oldest, "
+                "r.last_sent, COALESCE(r.failures, 0) AS failures, r.retry_at "
+                "FROM outbox o LEFT JOIN alert_recipients r ON r.recipient = o.recipient "
+                "GROUP BY o.recipient"
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def pending_alerts(self, recipient):
+        """(outbox ids, change records) queued for a recipient, oldest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT o.id AS outbox_id, c.* FROM outbox o LEFT JOIN changes c ON c.id = o.change_id "
+                "WHERE o.recipient = ? ORDER BY o.id",
+                (recipient,)
+            ).fetchall()
+        ids = [row['outbox_id'] for row in rows]
+        # A change compacted away before it was sent still counts as sent
+        changes = [self.change_from_row(row) for row in rows if row['changes'] is not None]
+        for change in changes:
+            change.pop('outbox_id', None)
+        return ids, changes
+    
+    def mark_alerts_sent(self, recipient, outbox_ids):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM outbox WHERE id = ?", ((i,) for i in outbox_ids))
+            self.conn.execute(
+                "INSERT INTO alert_recipients (recipient, last_sent, failures, retry_at) VALUES (?, ?, 0, NULL) "
+                "ON CONFLICT (recipient) DO UPDATE SET last_sent = excluded.last_sent, failures = 0, retry_at = NULL",
+                (recipient, time.time())
+            )
+    
+    def mark_alert_failed(self, recipient, retry_at):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO alert_recipients (recipient, failures, retry_at) VALUES (?, 1, ?) "
+                "ON CONFLICT (recipient) DO UPDATE SET failures = failures + 1, retry_at = excluded.retry_at",
+                (recipient, retry_at)
+            )
+    
+    def drop_alerts(self, recipient, outbox_ids):
+        """Give up on queued alerts and clear the recipient's failure count."""
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM outbox WHERE id = ?", ((i,) for i in outbox_ids))
+            self.conn.execute(
+                "UPDATE alert_recipients SET failures = 0, retry_at = NULL WHERE recipient = ?", (recipient,)
+            )
+    
+    # Digest ZIP snapshots from before snapshot_store.py; now only read as a baseline
+    
+    def load_snapshot(self, watch_id):
+        """Return (fields, {assessment_num: digest}) or None if never taken."""
+        with self.lock:
+            meta = self.conn.execute(
+                "SELECT fields FROM snapshots WHERE watch_id = ?", (watch_id,)
+            ).fetchone()
+            if meta is None:
+                return None
+            rows = self.conn.execute(
+                "SELECT assessment_num, digest FROM snapshot_parcels WHERE watch_id = ?",
+                (watch_id,)
+            )
+            parcels = dict(rows.fetchall())
+        return json.loads(meta['fields']), parcels
+    
+    def _save_snapshot(self, watch_id, fields, parcels, taken):
+        self.conn.execute("DELETE FROM snapshot_parcels WHERE watch_id = ?", (watch_id,))
+        self.conn.executemany(
+            "INSERT INTO snapshot_parcels (watch_id, assessment_num, digest) VALUES (?, ?, ?)",
+            ((watch_id, num, digest) for num, digest in parcels.items())
+        )
+        self.conn.execute(
+            "INSERT INTO snapshots (watch_id, taken, fields) VALUES (?, ?, ?) "
+            "ON CONFLICT (watch_id) DO UPDATE SET taken = excluded.taken, fields = excluded.fields",
+            (watch_id, taken, json.dumps(fields))
+        )
+    
+    # Migration
+    
+    def migrate_json(self, properties_file, changes_file, snapshot_dir=None):
+        """One-shot import of the legacy JSON files; later calls are no-ops.
+        
+        Everything, including the migrated flag, is written in one
+        transaction so an interrupted migration is simply redone.
+        """
+        if self.get_meta('json_migrated'):
+            return
+        
+        def load(path):
+            try:
+                with open(path, 'r') as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                return []
+        
+        tracked = load(properties_file)
+        changes = load(changes_file)
+        snapshots = []
+        if snapshot_dir and Path(snapshot_dir).is_dir():
+            for path in Path(snapshot_dir).glob('*.json'):
+                with open(path, 'r') as f:
+                    snapshots.append((path.stem, json.load(f)))
+        
+        with self.lock, self.conn:
+            # Claiming the flag first takes the write lock, so a concurrent
+            # starter waits here and then finds it set
+            claimed = self.conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('json_migrated', '1')"
+            ).rowcount
+            if not claimed:
+                return
+            self._upsert_tracked(tracked, self._touch())
+            self._append_changes(changes)
+            for watch_id, snapshot in snapshots:
+                self._save_snapshot(watch_id, snapshot['fields'], snapshot['parcels'], snapshot.get('taken'))
+        
+        snapshots = len(snapshots)
+        logger.info(f"Migrated {len(tracked)} tracked, {len(changes)} changes, {snapshots} snapshots to {self.db_file}")
@@ -0,0 +1,169 @@
+"""
+RESPONSE CACHE
+On-disk cache of ArcGIS JSON responses with per-endpoint TTLs,
+conditional revalidation and an LRU size cap
+"""
+
+import sqlite3
+import json
+import hashlib
+import threading
+import time
+import zlib
+import logging
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# First matching URL fragment wins; the geocoder barely changes, parcel
+# attributes do, and anything unlisted is not cached
+DEFAULT_TTLS = {
+    'GeocodeServer': 30 * 24 * 3600,
+    'MapServer': 15 * 60
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT
+);
+CREATE INDEX IF NOT EXISTS responses_access ON responses (last_access);
+"""
+
+
+class CachedResponse:
+    def __init__(self, key, body, fresh, etag=None, last_modified=None):
+        self.key = key
+        self.body = body
+        self.fresh = fresh
+        self.etag = etag
+        self.last_modified = last_modified
+    
+    def validators(self):
+        """Conditional request headers for revalidating a stale entry."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    def __init__(self, db_file='data/http_cache.db', max_mb=200, ttls=None):
+        Path(db_file).parent.mkdir(parents=True, exist_ok=True)
+        self.db_file = db_file
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttls = ttls if ttls is not None else DEFAULT_TTLS
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.counters = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stores': 0, 'evictions': 0}
+    
+    def ttl_for(self, url):
+        for fragment, ttl in self.ttls.items():
+            if fragment in url:
+                return ttl
+        return 0
+    
+    @staticmethod
+    def make_key(method, url, params):
+        """Stable key for a request: lower-cased host, params sorted, values as text."""
+        parts = urlsplit(url)
+        normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), '', ''))
+        items = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        raw = json.dumps([method, normalized, items], separators=(',', ':'))
+        return hashlib.sha256(raw.encode()).hexdigest()
+    
+    def get(self, method, url, params):
+        """Return a CachedResponse (fresh or stale) or None on a miss."""
+        if not self.ttl_for(url):
+            return None
+        key = self.make_key(method, url, params)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT body, expires_at, etag, last_modified FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.counters['misses'] += 1
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            fresh = row[1] > now
+            self.counters['hits' if fresh else 'misses'] += 1
+        body = json.loads(zlib.decompress(row[0]))
+        return CachedResponse(key, body, fresh, row[2], row[3])
+    
+    def put(self, method, url, params, body, etag=None, last_modified=None):
+        ttl = self.ttl_for(url)
+        if not ttl:
+            return
+        key = self.make_key(method, url, params)
+        blob = zlib.compress(json.dumps(body, separators=(',', ':')).encode())
+        now = time.time()
+        with self.lock, self.conn:
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.total_bytes += len(blob) - (old[0] if old else 0)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, url, body, size, stored_at, expires_at, last_access, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, blob, len(blob), now, now + ttl, now, etag, last_modified)
+            )
+            self.counters['stores'] += 1
+            self._evict()
+    
+    def revalidated(self, cached, url):
+        """Server answered 304: the stale entry is good for another TTL."""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE responses SET expires_at = ?, last_access = ? WHERE key = ?",
+                (now + self.ttl_for(url), now, cached.key)
+            )
+            self.counters['revalidated'] += 1
+    
+    def _evict(self):
+        """Drop least recently used entries until the cache is under 90% of its cap."""
+        if self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        doomed = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if self.total_bytes <= target:
+                break
+            doomed.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.counters['evictions'] += len(doomed)
+    
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
+            self.total_bytes = 0
+    
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            stats = dict(self.counters)
+        lookups = stats['hits'] + stats['misses']
+        stats.update(
+            entries=entries,
+            bytes=size,
+            hit_rate=round(stats['hits'] / lookups, 3) if lookups else 0.0
+        )
+        return stats
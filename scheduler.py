@@ -0,0 +1,268 @@
+"""
+SCAN SCHEDULER
+Splits the watchlist into shards and checks the due ones across worker
+processes; SQLite leases keep two workers (or a worker and a manual
+check) off the same shard
+
+    python scheduler.py                    # run on the configured schedule
+    python scheduler.py --once --workers 4
+"""
+
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import schedule
+
+from fetch_engine import RateLimiter
+from monitor_service import PropertyMonitor, record_check_run
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIES = {'hourly': 1, 'daily': 24, 'weekly': 168}
+
+
+def frequency_hours(value):
+    """Hours between checks for 'hourly', 'daily', 'weekly' or a number of hours."""
+    return FREQUENCIES[value] if value in FREQUENCIES else float(value)
+
+
+def shard_key(prop, shard_size=50000):
+    """ZIP watches are a shard each; parcels are sharded by assessment number range.
+    
+    Ranges are fixed (shard_size numbers wide) rather than balanced so every
+    worker agrees on them however the watchlist changes in between.
+    """
+    if prop['search_type'] == 'zip':
+        return f"zip:{prop['search_value']}"
+    assessment_num = str(prop.get('current_data', {}).get('ASSESSMENT_NUM') or '')
+    if assessment_num.isdigit():
+        start = int(assessment_num) // shard_size * shard_size
+        return f"assessment:{start}-{start + shard_size - 1}"
+    if assessment_num:
+        return f"assessment:{assessment_num[:2]}"
+    return 'unkeyed'
+
+
+class ShardScheduler:
+    """Checks due shards in one process, holding a lease on each while it runs."""
+    
+    def __init__(self, monitor, owner=None):
+        self.monitor = monitor
+        config = monitor.config.get('scheduler', {})
+        self.lease_seconds = config.get('lease_seconds', 1800)
+        self.shard_size = config.get('shard_size', 50000)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    
+    def frequency(self, prop):
+        """monitoring.watch_frequency[<watch id>], else monitoring.check_frequency."""
+        monitoring = self.monitor.config.get('monitoring', {})
+        value = monitoring.get('watch_frequency', {}).get(prop['id'], monitoring.get('check_frequency', 'daily'))
+        return timedelta(hours=frequency_hours(value))
+    
+    def is_due(self, prop, now):
+        last_checked = prop.get('last_checked')
+        if not last_checked:
+            return True
+        # Some slack so a nightly check doesn't slip a little later every night
+        return now - datetime.fromisoformat(last_checked) >= self.frequency(prop) * 0.9
+    
+    def due_shards(self, now=None):
+        """{shard: [due entries]}, the longest-waiting shards first."""
+        now = now or datetime.now()
+        shards = {}
+        for prop in self.monitor.tracked_properties:
+            if self.is_due(prop, now):
+                shards.setdefault(shard_key(prop, self.shard_size), []).append(prop)
+        return dict(sorted(
+            shards.items(), key=lambda item: min(p.get('last_checked') or '' for p in item[1])
+        ))
+    
+    def renewing(self, shard, progress=None):
+        """check_all_properties() progress callback that keeps the shard's lease alive."""
+        renewed = time.monotonic()
+        
+        def callback(done, total, changes):
+            nonlocal renewed
+            if time.monotonic() - renewed > self.lease_seconds / 2:
+                self.monitor.store.acquire_lease(shard, self.owner, self.lease_seconds)
+                renewed = time.monotonic()
+            if progress:
+                progress(done, total, changes)
+        return callback
+    
+    def run_shard(self, shard):
+        """Check one shard under its lease.
+        
+        Returns (entries checked, change records), or None if another
+        worker holds the shard or has already checked it.
+        """
+        store = self.monitor.store
+        if not store.acquire_lease(shard, self.owner, self.lease_seconds):
+            return None
+        try:
+            # The previous holder may have just finished it
+            self.monitor.refresh_if_stale()
+            entries = self.due_shards().get(shard, [])
+            if not entries:
+                return None
+            logger.info(f"Shard {shard}: checking {len(entries)} entries")
+            return len(entries), self.monitor.check_all_properties(self.renewing(shard), entries=entries)
+        finally:
+            store.release_lease(shard, self.owner)
+    
+    def run_all(self, progress=None):
+        """Check every entry now, due or not, one shard lease at a time (manual checks).
+        
+        Shards a worker holds are skipped since they are being checked
+        already. progress is called as progress(done, total, changes) over
+        the whole run. Returns the change records.
+        """
+        store = self.monitor.store
+        started = time.perf_counter()
+        self.monitor.refresh_if_stale()
+        shards = dict.fromkeys(shard_key(prop, self.shard_size) for prop in self.monitor.tracked_properties)
+        total = len(self.monitor.tracked_properties)
+        done = 0
+        changes = []
+        for shard in shards:
+            if not store.acquire_lease(shard, self.owner, self.lease_seconds):
+                logger.info(f"Shard {shard}: held by another worker, skipping")
+                continue
+            try:
+                self.monitor.refresh_if_stale()
+                entries = [p for p in self.monitor.tracked_properties if shard_key(p, self.shard_size) == shard]
+                offset, found = done, len(changes)
+                
+                def shard_progress(shard_done, shard_total, shard_changes):
+                    if progress:
+                        progress(min(offset + shard_done, total), total, found + shard_changes)
+                
+                changes += self.monitor.check_all_properties(
+                    self.renewing(shard, shard_progress), entries=entries
+                ) or []
+                done += len(entries)
+            finally:
+                store.release_lease(shard, self.owner)
+        record_check_run(done, time.perf_counter() - started)
+        if progress:
+            progress(total, total, len(changes))
+        return changes
+    
+    def run_due(self, deadline=None, stagger=0):
+        """Check due shards until none are left or the deadline passes.
+        
+        Returns (shards checked, entries checked, change records).
+        """
+        shards_checked = entries = changes = 0
+        self.monitor.refresh_if_stale()
+        for shard in self.due_shards():
+            if deadline and time.time() >= deadline:
+                logger.warning(f"Scan window closed with shards still due (next: {shard})")
+                break
+            try:
+                result = self.run_shard(shard)
+            except Exception as e:
+                # One bad shard shouldn't end the scan; it is still due next time
+                logger.exception(f"Shard {shard}: check failed: {e}")
+                continue
+            if result is None:
+                continue
+            shards_checked += 1
+            entries += result[0]
+            changes += len(result[1])
+            if stagger:
+                time.sleep(stagger)
+        return shards_checked, entries, changes
+
+
+def run_worker(config_file, index, workers, deadline):
+    """Body of one worker process."""
+    monitor = PropertyMonitor(config_file)
+    config = monitor.config.get('scheduler', {})
+    # Workers split the county rate budget between them
+    rps = monitor.config.get('fetch', {}).get('requests_per_second', 10)
+    monitor.fetcher.rate_limiter = RateLimiter(rps / workers if rps else 0)
+    time.sleep(index * config.get('stagger_seconds', 5))
+    owner = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    return ShardScheduler(monitor, owner).run_due(deadline, config.get('stagger_seconds', 5))
+
+
+def run_scan(monitor, workers=None, window_hours=None):
+    """Check everything due across `workers` processes within the scan window."""
+    config = monitor.config.get('scheduler', {})
+    workers = workers or config.get('workers', 2)
+    window_hours = window_hours or config.get('window_hours', 6)
+    deadline = time.time() + window_hours * 3600
+    start = time.time()
+    
+    if workers == 1:
+        results = [ShardScheduler(monitor).run_due(deadline)]
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(run_worker, monitor.config_file, index, workers, deadline)
+                for index in range(workers)
+            ]
+            results = []
+            for index, future in enumerate(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.exception(f"Scan worker {index} failed: {e}")
+    
+    shards = sum(r[0] for r in results)
+    entries = sum(r[1] for r in results)
+    changes = sum(r[2] for r in results)
+    # Workers' own metrics die with their processes, so the scan is recorded here
+    elapsed = time.time() - start
+    record_check_run(entries, elapsed)
+    logger.info(f"Scan finished: {shards} shards, {changes} change records in {elapsed:.0f}s")
+    monitor.load_state()
+    return shards, changes
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config', type=str, default='config.json')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--window-hours', type=float)
+    parser.add_argument('--once', action='store_true', help='run one scan now and exit')
+    
+    args = parser.parse_args()
+    # Built once up front so the store is created and migrated before workers start
+    monitor = PropertyMonitor(args.config)
+    
+    def scan():
+        # Errors are logged, not raised, so the schedule loop keeps running
+        try:
+            run_scan(monitor, args.workers, args.window_hours)
+        except Exception as e:
+            logger.exception(f"Scan failed: {e}")
+        try:
+            monitor.compact_history()
+        except Exception as e:
+            logger.exception(f"History compaction failed: {e}")
+    
+    if args.once:
+        scan()
+        monitor.alerts.drain()
+    else:
+        monitor.alerts.start()
+        monitoring = monitor.config.get('monitoring', {})
+        frequencies = [monitoring.get('check_frequency', 'daily')]
+        frequencies += list(monitoring.get('watch_frequency', {}).values())
+        schedule.every().day.at(monitoring.get('check_time', '09:00')).do(scan)
+        if min(frequency_hours(f) for f in frequencies) < 24:
+            schedule.every(monitor.config.get('scheduler', {}).get('tick_minutes', 15)).minutes.do(scan)
+        logger.info(f"Scheduler started; next scan at {schedule.next_run()}")
+        while True:
+            schedule.run_pending()
+            time.sleep(30)
@@ -0,0 +1,337 @@
+"""
+SNAPSHOT STORE
+Compact columnar parcel snapshots, one memory-mappable file per watch
+per snapshot date, readable without parsing any JSON per parcel
+
+Layout of a .snap file:
+
+    b'PMSNAP1\\n' | header length (uint64 LE) | JSON header | column blocks
+
+Every parcel field becomes a column, rows sorted by ASSESSMENT_NUM.
+Integer and float fields are stored as raw int64/float64 buffers (nulls
+as INT_NULL / NaN); everything else is dictionary-encoded: a code array
+(uint8/16/32, code 0 meaning null) plus the distinct values as UTF-8.
+Blocks are 8-byte aligned so they can be viewed straight out of the mmap.
+"""
+
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import logging
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PMSNAP1\n'
+INT_NULL = -2 ** 63
+INT_MIN, INT_MAX = -2 ** 63 + 1, 2 ** 63 - 1
+
+
+def _pad(length):
+    return -length % 8
+
+
+def _dict_key(value):
+    # 1, 1.0 and True hash alike, so the type is part of the key
+    if isinstance(value, (dict, list)):
+        return ('json', json.dumps(value, sort_keys=True))
+    return (type(value), value)
+
+
+def _code_typecode(size):
+    if size <= 0xFF:
+        return 'B'
+    if size <= 0xFFFF:
+        return 'H'
+    return 'I'
+
+
+def _column_kind(values):
+    """'int', 'float', 'str' or 'json' for a column's distinct non-null values."""
+    if all(type(v) is int and INT_MIN <= v <= INT_MAX for v in values):
+        return 'int'
+    if all(type(v) in (int, float) for v in values):
+        return 'float'
+    if all(type(v) is str for v in values):
+        return 'str'
+    return 'json'
+
+
+class ColumnBuilder:
+    """Dictionary-encodes one field while rows stream in."""
+    
+    def __init__(self, backfill=0):
+        self.codes = array('I', bytes(4 * backfill))
+        self.values = [None]
+        self.lookup = {}
+    
+    def append(self, value):
+        if value is None:
+            self.codes.append(0)
+            return
+        key = _dict_key(value)
+        code = self.lookup.get(key)
+        if code is None:
+            code = self.lookup[key] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+    
+    def encode(self, order):
+        """(kind, {block name: buffer}) for the rows in the given order."""
+        values = self.values
+        kind = _column_kind(values[1:])
+        codes = [self.codes[i] for i in order]
+        if kind == 'int':
+            return kind, {'values': array('q', (INT_NULL if c == 0 else values[c] for c in codes))}
+        if kind == 'float':
+            return kind, {'values': array('d', (math.nan if c == 0 else float(values[c]) for c in codes))}
+        
+        encoded = [b''] + [
+            (v if kind == 'str' else json.dumps(v, sort_keys=True)).encode('utf-8') for v in values[1:]
+        ]
+        offsets = array('Q', [0])
+        for item in encoded:
+            offsets.append(offsets[-1] + len(item))
+        codes = array(_code_typecode(len(values)), codes)
+        return kind, {'codes': codes, 'offsets': offsets, 'data': b''.join(encoded)}
+
+
+class SnapshotWriter:
+    """Accumulates parcel attribute dicts and writes them as a .snap file."""
+    
+    def __init__(self, key='ASSESSMENT_NUM'):
+        self.key = key
+        self.rows = 0
+        self.columns = {}
+    
+    def add(self, attributes):
+        for field, value in attributes.items():
+            column = self.columns.get(field)
+            if column is None:
+                column = self.columns[field] = ColumnBuilder(self.rows)
+            column.append(str(value) if field == self.key and value is not None else value)
+        self.rows += 1
+        for column in self.columns.values():
+            if len(column.codes) < self.rows:
+                column.codes.append(0)
+    
+    def write(self, path, taken=None):
+        """Write the snapshot atomically; returns the number of rows."""
+        key_column = self.columns.get(self.key)
+        if key_column is None:
+            order = range(self.rows)
+        else:
+            keys = [key_column.values[c] or '' for c in key_column.codes]
+            order = sorted(range(self.rows), key=keys.__getitem__)
+        
+        header = {
+            'version': 1,
+            'taken': taken,
+            'rows': self.rows,
+            'key': self.key,
+            'byteorder': sys.byteorder,
+            'fields': sorted(self.columns),
+            'columns': {}
+        }
+        blocks = []
+        position = 0
+        for field in header['fields']:
+            kind, buffers = self.columns[field].encode(order)
+            spec = {'kind': kind}
+            for name, buffer in buffers.items():
+                raw = bytes(buffer)
+                if isinstance(buffer, array):
+                    spec[f"{name}_type"] = buffer.typecode
+                spec[name] = [position, len(raw)]
+                blocks.append(raw + bytes(_pad(len(raw))))
+                position += len(raw) + _pad(len(raw))
+            header['columns'][field] = spec
+        
+        encoded_header = json.dumps(header).encode('utf-8')
+        encoded_header += b' ' * _pad(len(MAGIC) + 8 + len(encoded_header))
+        
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp = path.with_suffix('.tmp')
+        with open(temp, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(encoded_header)))
+            f.write(encoded_header)
+            for block in blocks:
+                f.write(block)
+        os.replace(temp, path)
+        return self.rows
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a .snap file."""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a parcel snapshot")
+        header_length = struct.unpack_from('<Q', self._mm, len(MAGIC))[0]
+        self._base = len(MAGIC) + 8 + header_length
+        header = json.loads(self._mm[len(MAGIC) + 8:self._base])
+        if header['byteorder'] != sys.byteorder:
+            self._mm.close()
+            raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+        self.header = header
+        self.taken = header['taken']
+        self.rows = header['rows']
+        self.key = header['key']
+        self.fields = header['fields']
+        self._dictionaries = {}
+        self._keys = None
+    
+    def __len__(self):
+        return self.rows
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        try:
+            self._mm.close()
+        except BufferError:
+            # Column views are still referenced; the map goes when they do
+            pass
+    
+    def kind(self, field):
+        return self.header['columns'][field]['kind']
+    
+    def block(self, field, name):
+        """Zero-copy memoryview of one of a column's buffers."""
+        spec = self.header['columns'][field]
+        offset, length = spec[name]
+        view = memoryview(self._mm)[self._base + offset:self._base + offset + length]
+        typecode = spec.get(f"{name}_type")
+        return view.cast(typecode) if typecode else view
+    
+    def entries(self, field):
+        """Raw UTF-8 dictionary entries of a column; index 0 (null) is b''."""
+        offsets = self.block(field, 'offsets').tolist()
+        data = bytes(self.block(field, 'data'))
+        return [data[start:end] for start, end in zip(offsets, offsets[1:])]
+    
+    def dictionary(self, field):
+        """Distinct values of a dictionary-encoded column; index 0 is None."""
+        if field not in self._dictionaries:
+            if self.kind(field) == 'str':
+                offsets = self.block(field, 'offsets').tolist()
+                text = bytes(self.block(field, 'data')).decode('utf-8')
+                if len(text) == offsets[-1]:
+                    # All ASCII, so byte offsets are character offsets
+                    values = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+                else:
+                    values = [entry.decode('utf-8') for entry in self.entries(field)]
+            else:
+                values = [json.loads(entry) if entry else None for entry in self.entries(field)]
+            values[0] = None
+            self._dictionaries[field] = values
+        return self._dictionaries[field]
+    
+    def value(self, field, row):
+        if field not in self.header['columns']:
+            return None
+        kind = self.kind(field)
+        if kind in ('int', 'float'):
+            value = self.block(field, 'values')[row]
+            if kind == 'int':
+                return None if value == INT_NULL else value
+            return None if math.isnan(value) else value
+        return self.dictionary(field)[self.block(field, 'codes')[row]]
+    
+    def values(self, field):
+        """Every row's value of one field, decoded."""
+        kind = self.kind(field)
+        if kind == 'int':
+            return [None if v == INT_NULL else v for v in self.block(field, 'values')]
+        if kind == 'float':
+            return [None if math.isnan(v) else v for v in self.block(field, 'values')]
+        dictionary = self.dictionary(field)
+        return [dictionary[c] for c in self.block(field, 'codes')]
+    
+    def keys(self):
+        """Sorted ASSESSMENT_NUMs, one per row."""
+        if self._keys is None:
+            self._keys = self.values(self.key) if self.key in self.header['columns'] else []
+        return self._keys
+    
+    def find(self, key):
+        """Row number for a key, or None."""
+        keys = self.keys()
+        row = bisect_left(keys, str(key))
+        return row if row < len(keys) and keys[row] == str(key) else None
+    
+    def row(self, row):
+        return {field: self.value(field, row) for field in self.fields}
+    
+    def get(self, key):
+        """Attributes of one parcel by ASSESSMENT_NUM, or None."""
+        row = self.find(key)
+        return None if row is None else self.row(row)
+    
+    def __iter__(self):
+        columns = [self.values(field) for field in self.fields]
+        for values in zip(*columns):
+            yield dict(zip(self.fields, values))
+
+
+class SnapshotStore:
+    """data/snapshots/<watch id>/<YYYY-MM-DD>.snap, keeping the newest few."""
+    
+    def __init__(self, directory='data/snapshots', keep=30):
+        self.directory = Path(directory)
+        self.keep = keep
+    
+    def _watch_dir(self, watch_id):
+        return self.directory / re.sub(r'[^\w.-]', '_', str(watch_id))
+    
+    def dates(self, watch_id):
+        return sorted(p.stem for p in self._watch_dir(watch_id).glob('*.snap'))
+    
+    def open(self, watch_id, date=None):
+        """The snapshot taken on date (default: the latest), or None."""
+        if date is None:
+            dates = self.dates(watch_id)
+            if not dates:
+                return None
+            date = dates[-1]
+        path = self._watch_dir(watch_id) / f"{date}.snap"
+        return Snapshot(path) if path.exists() else None
+    
+    def stage(self, watch_id, writer, taken):
+        """Write a snapshot that open() and dates() won't see until commit()."""
+        path = self._watch_dir(watch_id) / f"{str(taken)[:10]}.snap.pending"
+        rows = writer.write(path, taken)
+        logger.info(f"Snapshot {path}: {rows} parcels, {path.stat().st_size / 1024 / 1024:.1f} MB")
+        return path
+    
+    def commit(self, watch_id, path):
+        """Move a staged snapshot into place; returns its final path."""
+        final = path.with_suffix('')
+        os.replace(path, final)
+        self.prune(watch_id)
+        return final
+    
+    def discard(self, path):
+        path.unlink(missing_ok=True)
+    
+    def prune(self, watch_id):
+        if not self.keep:
+            return
+        for date in self.dates(watch_id)[:-self.keep]:
+            (self._watch_dir(watch_id) / f"{date}.snap").unlink(missing_ok=True)
@@ -0,0 +1,128 @@
+"""
+ALERT DISPATCH TESTS
+AlertDispatcher.drain() against a local fake SMTP server
+
+    python -m pytest test_alerts.py
+"""
+
+import shutil
+import socketserver
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from alerts import AlertDispatcher
+from property_store import PropertyStore
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib.sendmail(); refuses the server's `refused` addresses at RCPT."""
+    
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+    
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 fake ESMTP")
+        recipient = None
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply("250 fake")
+            elif command == 'MAIL':
+                self.reply("250 OK")
+            elif command == 'RCPT':
+                recipient = line.split(':', 1)[1].strip().strip('<>')
+                self.reply("550 No such user" if recipient in server.refused else "250 OK")
+            elif command == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline().rstrip(b'\r\n') != b'.':
+                    pass
+                with server.lock:
+                    server.delivered.append(recipient)
+                self.reply("250 OK")
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, refused=()):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.refused = set(refused)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.delivered = []
+
+
+class DrainTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeSMTPServer(refused={'gone@example.com'})
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.workdir = tempfile.mkdtemp()
+        self.store = PropertyStore(str(Path(self.workdir) / 'store.db'))
+        self.dispatcher = AlertDispatcher(self.store, {
+            'enabled': True, 'smtp_host': '127.0.0.1', 'smtp_port': self.server.server_address[1],
+            'max_failures': 2
+        })
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.store.close()
+        shutil.rmtree(self.workdir)
+    
+    def queue(self, *recipients):
+        changes = [
+            {
+                'property_id': f"p{i}", 'property_address': f"{i} MAIN ST", 'detected_date': '2026-01-01T00:00:00',
+                'changes': [{'field': 'OWNER', 'old_value': 'A', 'new_value': 'B'}]
+            }
+            for i in range(len(recipients))
+        ]
+        self.store.append_changes(changes, [[r] for r in recipients])
+    
+    def pending(self):
+        return {r['recipient']: r for r in self.store.pending_recipients()}
+    
+    def test_one_connection_and_refused_recipient_isolated(self):
+        self.queue('a@example.com', 'gone@example.com', 'b@example.com')
+        
+        self.assertEqual(self.dispatcher.drain(), 2)
+        
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(sorted(self.server.delivered), ['a@example.com', 'b@example.com'])
+        pending = self.pending()
+        self.assertEqual(list(pending), ['gone@example.com'])
+        self.assertEqual(pending['gone@example.com']['failures'], 1)
+        # One refusal is not a server-wide failure
+        self.assertEqual(self.dispatcher.retry_at, 0)
+    
+    def test_refused_alerts_dropped_after_max_failures(self):
+        self.queue('gone@example.com')
+        
+        self.dispatcher.drain()
+        self.assertEqual(self.pending()['gone@example.com']['failures'], 1)
+        
+        # Skip the backoff
+        with self.store.lock, self.store.conn:
+            self.store.conn.execute("UPDATE alert_recipients SET retry_at = NULL")
+        self.dispatcher.drain()
+        
+        self.assertEqual(self.pending(), {})
+        self.assertEqual(self.server.delivered, [])
+
+
+if __name__ == '__main__':
+    unittest.main()